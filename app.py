@@ -1,12 +1,14 @@
 import streamlit as st
 import os
+import time
 from config import Config
-from story_processor import StoryProcessor
-from world_builder import WorldBuilder
-from scene_generator import SceneGenerator
+from jobs import get_job_queue, QueueFullError, TERMINAL_STATUSES
+from workspace import document_key, safe_filename
 
 st.set_page_config(page_title="Story Reimagination System", layout="wide")
 
+job_queue = get_job_queue(Config())
+
 st.title("Story Reimagination System")
 st.markdown("Transform classic stories into new worlds using AI")
 
@@ -34,6 +36,7 @@ with col1:
     )
     
     source_text = None
+    uploaded_file = None
     
     if input_method == "Paste Text":
         source_text = st.text_area(
@@ -47,10 +50,7 @@ with col1:
             type=["pdf"]
         )
         if uploaded_file:
-            temp_path = f"temp_{uploaded_file.name}"
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.read())
-            source_text = temp_path
+            source_text = uploaded_file.name
 
 with col2:
     st.subheader("Define New World")
@@ -108,9 +108,17 @@ with col2:
     
     st.markdown("---")
     st.caption("All inputs will be combined to create your new world")
+    
+    extra_worlds = st.text_area(
+        "Batch: also reimagine into these worlds (optional, one per line):",
+        placeholder="e.g., Cyberpunk Tokyo, 2088, rain-soaked and dark\nVictorian London, 1888, gaslit mystery",
+        height=100
+    )
 
 st.markdown("---")
 
+bypass_cache = st.checkbox("Bypass cache (force fresh generation)", value=False)
+
 if st.button("Reimagine Story", type="primary", disabled=not (source_text and specific_setting and time_period)):
     
     if not source_text:
@@ -136,60 +144,179 @@ if st.button("Reimagine Story", type="primary", disabled=not (source_text and sp
         new_world = " | ".join(new_world_parts)
         try:
             config = Config()
+            config.cache_bypass = bypass_cache
+            config.document_key = document_key(uploaded_file.name if uploaded_file else None, source_text)
             
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            status_text.text("Step 1/5: Extracting and chunking story...")
-            progress_bar.progress(10)
-            processor = StoryProcessor(config)
-            story_dna = processor.process_story(source_text)
-            
-            status_text.text("Step 2/5: Analyzing story DNA...")
-            progress_bar.progress(30)
-            
-            st.success("Story DNA extracted successfully")
-            with st.expander("View Story DNA"):
-                st.json(story_dna)
-            
-            status_text.text("Step 3/5: Building new world...")
-            progress_bar.progress(50)
-            builder = WorldBuilder(config)
-            transformation_map = builder.build_new_world(story_dna, new_world)
-            
-            st.success("World transformation map created")
-            with st.expander("View Transformation Map"):
-                st.json(transformation_map)
-            
-            status_text.text("Step 4/5: Generating scenes...")
-            progress_bar.progress(70)
-            generator = SceneGenerator(config)
-            final_story = generator.generate_full_story(story_dna, transformation_map)
+            if uploaded_file:
+                # Uploads live inside the run workspace so concurrent sessions never share a path.
+                source_text = config.save_output(
+                    uploaded_file.getvalue(),
+                    safe_filename(uploaded_file.name),
+                    "inputs"
+                )
             
-            status_text.text("Step 5/5: Polishing final story...")
-            progress_bar.progress(90)
-            
-            progress_bar.progress(100)
-            status_text.text("Complete!")
-            
-            st.markdown("---")
-            st.subheader("Reimagined Story")
-            
-            st.markdown(final_story)
+            world_choices = [new_world] + [line.strip() for line in extra_worlds.splitlines() if line.strip()]
+            if len(world_choices) > 1:
+                # The story DNA is extracted once and shared by every world in the batch.
+                run_id = job_queue.submit_batch(config, source_text, world_choices)
+            else:
+                run_id = job_queue.submit(config, source_text, new_world)
+            st.query_params["run_id"] = run_id
             
+        except (QueueFullError, ValueError) as e:
+            st.error(str(e))
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+
+def show_performance_summary(config, run_id):
+    trace_file = f"trace_{run_id}.json"
+    if not os.path.exists(config.output_path(trace_file, "traces")):
+        return
+    trace_summary = config.load_output(trace_file, "traces")["summary"]
+    cache_stats = trace_summary.get("cache", {})
+    context_stats = trace_summary.get("context", {})
+    
+    st.caption(
+        f"LLM cache: {cache_stats.get('hits', 0)} hits, {cache_stats.get('misses', 0)} misses | "
+        f"Prompt context: {context_stats.get('tokens_sent', 0)} tokens sent, {context_stats.get('tokens_saved', 0)} saved"
+    )
+    
+    with st.expander("Performance Summary"):
+        metric_cols = st.columns(4)
+        metric_cols[0].metric("Total time", f"{trace_summary['total_time']:.1f}s")
+        metric_cols[1].metric("LLM calls", trace_summary["llm_calls"])
+        metric_cols[2].metric("Prompt tokens", trace_summary["prompt_tokens"])
+        metric_cols[3].metric("Completion tokens", trace_summary["completion_tokens"])
+        
+        st.markdown("**Stages**")
+        st.table([
+            {"stage": name, "seconds": seconds}
+            for name, seconds in trace_summary["stages"].items()
+        ])
+        
+        st.markdown("**LLM calls**")
+        st.table([
+            {"call": label, **stats}
+            for label, stats in sorted(trace_summary["calls_by_label"].items(), key=lambda item: -item[1]["wall_time"])
+        ])
+
+def show_batch_results(worlds, downloads=False):
+    for i, world in enumerate(worlds):
+        if world is None:
+            continue
+        with st.expander(f"World {i + 1}: {world['world']}"):
+            if world.get("error"):
+                st.error(f"Error: {world['error']}")
+                continue
+            st.markdown(world["final_story"])
+            if not downloads:
+                continue
             st.download_button(
                 label="Download Story",
-                data=final_story,
-                file_name="reimagined_story.txt",
-                mime="text/plain"
+                data=world["final_story"],
+                file_name=f"reimagined_story_{i + 1}.txt",
+                mime="text/plain",
+                key=f"download_world_{i}"
             )
-            
-            if input_method == "Upload PDF" and os.path.exists(source_text):
-                os.remove(source_text)
-            
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
-            if input_method == "Upload PDF" and os.path.exists(source_text):
-                os.remove(source_text)
+
+def stream_partial_story(config, run_id):
+    # Feeds st.write_stream from the worker's growing story until the job finishes.
+    sent = 0
+    while True:
+        state = job_queue.status(config, run_id)
+        story = state["partial_story"]
+        if len(story) > sent:
+            yield story[sent:]
+            sent = len(story)
+        if state["status"] in TERMINAL_STATUSES:
+            return
+        time.sleep(0.1)
+
+def show_job(run_id):
+    config = Config()
+    state = job_queue.status(config, run_id)
+    if state is None:
+        st.warning(f"No reimagination job found for run {run_id}")
+        return
+    config.start_run(run_id)
+    
+    st.caption(f"Run ID: {run_id} (keep this page's link to come back to the results)")
+    progress_bar = st.progress(state["progress"])
+    status_text = st.empty()
+    dna_slot = st.empty()
+    map_slot = st.empty()
+    story_slot = st.empty()
+    shown = set()
+    
+    # Poll the worker; closing the page only stops this loop, never the job itself.
+    while True:
+        progress_bar.progress(state["progress"])
+        status_text.text(state["message"])
+        results = state["results"]
+        
+        if "story_dna" in results and "story_dna" not in shown:
+            shown.add("story_dna")
+            with dna_slot.container():
+                st.success("Story DNA extracted successfully")
+                with st.expander("View Story DNA"):
+                    st.json(results["story_dna"])
+        
+        if "transformation_map" in results and "transformation_map" not in shown:
+            shown.add("transformation_map")
+            with map_slot.container():
+                st.success("World transformation map created")
+                with st.expander("View Transformation Map"):
+                    st.json(results["transformation_map"])
+        
+        if state.get("world_choices"):
+            with story_slot.container():
+                show_batch_results(results.get("worlds", []))
+        elif "scenes" in results or state["partial_story"]:
+            # The polish step is all that is left, so stream its tokens instead of polling.
+            with story_slot.container():
+                st.markdown("---")
+                st.subheader("Reimagined Story")
+                st.write_stream(stream_partial_story(config, run_id))
+            state = job_queue.status(config, run_id)
+            progress_bar.progress(state["progress"])
+            status_text.text(state["message"])
+        
+        if state["status"] in TERMINAL_STATUSES:
+            break
+        time.sleep(0.5)
+        state = job_queue.status(config, run_id)
+    
+    if state["status"] in ("failed", "interrupted"):
+        if state["status"] == "failed":
+            st.error(f"Error: {state['error']}")
+        else:
+            st.warning(state["message"])
+        
+        # Completed stages, chunk summaries and scenes are checkpointed, so resuming skips them.
+        if st.button("Resume Run"):
+            try:
+                job_queue.resume(Config(), run_id)
+                st.rerun()
+            except (QueueFullError, ValueError) as e:
+                st.error(str(e))
+        return
+    
+    show_performance_summary(config, run_id)
+    
+    if state.get("world_choices"):
+        # Download buttons are widgets, so they are only added once polling has stopped.
+        with story_slot.container():
+            show_batch_results(state["results"].get("worlds", []), downloads=True)
+        return
+    
+    st.download_button(
+        label="Download Story",
+        data=state["results"].get("final_story", ""),
+        file_name="reimagined_story.txt",
+        mime="text/plain"
+    )
+
+if "run_id" in st.query_params:
+    show_job(st.query_params["run_id"])
 
 st.markdown("---")
\ No newline at end of file
@@ -0,0 +1,188 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from config import Config
+from fake_llm import FakeChatModel, FakeLLMStats
+from llm_client import set_llm_factory
+
+SOURCE_STORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inputs", "gift_of_magie")
+DEFAULT_SIZES = ["source", "1000", "10000", "100000", "500000"]
+WORLD_CHOICE = "Far-future orbital habitat, bittersweet tone"
+
+def synthetic_story(words):
+    with open(SOURCE_STORY, "r") as f:
+        source = [para.strip() for para in f.read().split("\n\n") if para.strip()]
+
+    paragraphs = []
+    total = 0
+    chapter = 0
+    while total < words:
+        chapter += 1
+        paragraphs.append(f"Chapter {chapter}")
+        for para in source:
+            # Number each repetition so chunks stay distinct and nothing is served from a cache.
+            para = f"{para} ({chapter})"
+            paragraphs.append(para)
+            total += len(para.split())
+            if total >= words:
+                break
+
+    return "\n\n".join(paragraphs)
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def benchmark_config(workspace, args):
+    config = Config()
+    config.cache_dir = os.path.join(workspace, "cache")
+    config.runs_dir = os.path.join(workspace, "runs")
+    config.start_run()
+
+    config.incremental = False
+    config.dna_merge_mode = args.merge_mode
+    config.scene_mode = args.scene_mode
+    config.chunking_mode = args.chunking_mode
+    # Measure the pipeline itself, not the production rate limits or backoff schedule.
+    config.llm_requests_per_minute = 1000000
+    config.llm_tokens_per_minute = 1000000000
+    config.retry_base_delay = args.latency
+    config.retry_max_delay = args.latency * 4
+    return config
+
+def run_single(size, args):
+    if size == "source":
+        with open(SOURCE_STORY, "r") as f:
+            text = f.read()
+    else:
+        text = synthetic_story(int(size))
+
+    stats = FakeLLMStats()
+    set_llm_factory(lambda config, temperature: FakeChatModel(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+        stats=stats
+    ))
+
+    from story_processor import StoryProcessor
+    from world_builder import WorldBuilder
+    from scene_generator import SceneGenerator
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="reimagine-bench-") as workspace:
+        config = benchmark_config(workspace, args)
+        processor = StoryProcessor(config)
+        builder = WorldBuilder(config)
+        generator = SceneGenerator(config)
+
+        stages = [
+            ("process_story", lambda state: processor.process_story(text)),
+            ("build_new_world", lambda state: builder.build_new_world(state["process_story"], WORLD_CHOICE)),
+            ("generate_full_story", lambda state: generator.generate_full_story(
+                state["process_story"],
+                state["build_new_world"]
+            ))
+        ]
+
+        state = {}
+        report = {
+            "size": size,
+            "words": len(text.split()),
+            "stages": {}
+        }
+        started = time.perf_counter()
+
+        for name, func in stages:
+            before = stats.snapshot()
+            stage_start = time.perf_counter()
+            state[name] = func(state)
+            after = stats.snapshot()
+            report["stages"][name] = {
+                "wall_time": round(time.perf_counter() - stage_start, 3),
+                "peak_rss_mb": peak_rss_mb(),
+                "calls": after["calls"] - before["calls"],
+                "failures": after["failures"] - before["failures"],
+                "prompt_bytes": after["prompt_bytes"] - before["prompt_bytes"]
+            }
+
+        report["wall_time"] = round(time.perf_counter() - started, 3)
+        report["peak_rss_mb"] = peak_rss_mb()
+        report["calls"] = stats.calls
+        report["prompt_bytes"] = stats.prompt_bytes
+        report["completed"] = bool(state["generate_full_story"])
+
+    return report
+
+def run_isolated(size, args):
+    # Each size runs in its own interpreter so peak RSS is not inherited from larger runs.
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--single", size,
+        "--latency", str(args.latency),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--failure-rate", str(args.failure_rate),
+        "--seed", str(args.seed),
+        "--merge-mode", args.merge_mode,
+        "--scene-mode", args.scene_mode,
+        "--chunking-mode", args.chunking_mode
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"size": size, "error": result.stderr.strip().splitlines()[-1:] or ["unknown error"]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def print_report(reports):
+    header = f"{'size':>8} {'words':>8} {'stage':<20} {'wall s':>8} {'rss MB':>8} {'calls':>6} {'prompt KB':>10}"
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        if "error" in report:
+            print(f"{report['size']:>8} failed: {report['error'][0]}")
+            continue
+        for name, stage in report["stages"].items():
+            print(
+                f"{report['size']:>8} {report['words']:>8} {name:<20} {stage['wall_time']:>8.2f} "
+                f"{stage['peak_rss_mb']:>8.1f} {stage['calls']:>6} {stage['prompt_bytes'] / 1024:>10.1f}"
+            )
+        print(
+            f"{report['size']:>8} {report['words']:>8} {'total':<20} {report['wall_time']:>8.2f} "
+            f"{report['peak_rss_mb']:>8.1f} {report['calls']:>6} {report['prompt_bytes'] / 1024:>10.1f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark using a deterministic fake LLM")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES), help="Comma-separated word counts; 'source' is the bundled sample story")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fixed seconds per fake LLM call")
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0, help="Fake generation throughput")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of fake calls that fail with a connection error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--merge-mode", default="rolling", choices=["rolling", "tree"])
+    parser.add_argument("--scene-mode", default="sequential", choices=["sequential", "outline"])
+    parser.add_argument("--chunking-mode", default="words", choices=["words", "tokens"])
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single, args)))
+        return
+
+    reports = [run_isolated(size.strip(), args) for size in args.sizes.split(",") if size.strip()]
+    print_report(reports)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from checkpoint import fingerprint_data
+from config import Config
+from pipeline import ReimaginationPipeline
+from rate_limiter import BudgetExhausted, get_rate_limiter
+from workspace import atomic_write, safe_filename
+
+logger = logging.getLogger("bulk")
+
+def discover_stories(input_dir):
+    stories = []
+    for name in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, name)
+        if name.startswith(".") or not os.path.isfile(path):
+            continue
+        stories.append(path)
+    return stories
+
+def story_run_id(path, config):
+    # Stable per input file and output settings, so rerunning an interrupted bulk job resumes
+    # from its checkpoints while a run with different settings gets its own workspace.
+    stem = os.path.splitext(os.path.basename(path))[0]
+    slug = re.sub(r"[^A-Za-z0-9_-]", "-", stem)[:40]
+    digest = fingerprint_data(os.path.abspath(path), config.output_settings())[:8]
+    return f"bulk-{slug}-{digest}"
+
+def load_source(path):
+    if path.lower().endswith(".pdf"):
+        return path
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def story_config(path, args):
+    config = Config()
+    config.scene_mode = args.scene_mode
+    config.dna_merge_mode = args.merge_mode
+    config.cache_bypass = args.bypass_cache
+    config.start_run(story_run_id(path, config))
+    if args.fresh:
+        shutil.rmtree(config.run_dir(), ignore_errors=True)
+    return config
+
+def process_story(path, worlds, args):
+    limiter = get_rate_limiter(Config())
+    if limiter.budget is not None and limiter.budget.remaining() == 0:
+        return {"story": path, "status": "skipped", "error": "LLM call budget exhausted"}
+
+    config = story_config(path, args)
+    started = time.time()
+    stem = safe_filename(os.path.splitext(os.path.basename(path))[0])
+
+    try:
+        source = load_source(path)
+        pipeline = ReimaginationPipeline(config)
+        if len(worlds) == 1:
+            results = pipeline.run(source, worlds[0])
+            stories = [{"world": worlds[0], "final_story": results["final_story"]}]
+        else:
+            stories = pipeline.run_batch(source, worlds)["worlds"]
+    except Exception as e:
+        # One bad story must not take down an overnight run.
+        exhausted = isinstance(e, BudgetExhausted) or isinstance(e.__cause__, BudgetExhausted)
+        status = "budget_exhausted" if exhausted else "failed"
+        logger.error(f"{path}: {e}")
+        return {"story": path, "run_id": config.run_id, "status": status, "error": str(e)}
+
+    outputs = []
+    for i, story in enumerate(stories):
+        if story.get("error"):
+            continue
+        filename = f"{stem}.txt" if len(stories) == 1 else f"{stem}_world-{i + 1}.txt"
+        outputs.append(atomic_write(os.path.join(args.output_dir, filename), story["final_story"]))
+
+    config.get_tracer().save(config)
+    trace = config.get_tracer().summary()
+    failed_worlds = [story["world"] for story in stories if story.get("error")]
+    return {
+        "story": path,
+        "run_id": config.run_id,
+        "status": "partial" if failed_worlds else "completed",
+        "failed_worlds": failed_worlds,
+        "outputs": outputs,
+        "wall_time": round(time.time() - started, 3),
+        "llm_calls": trace["llm_calls"],
+        "prompt_tokens": trace["prompt_tokens"],
+        "completion_tokens": trace["completion_tokens"]
+    }
+
+def throughput_report(results, elapsed, budget):
+    done = [result for result in results if result["status"] in ("completed", "partial")]
+    tokens = [result["prompt_tokens"] + result["completion_tokens"] for result in done]
+    return {
+        "stories": len(results),
+        "completed": len(done),
+        "failed": sum(1 for result in results if result["status"] in ("failed", "budget_exhausted")),
+        "skipped": sum(1 for result in results if result["status"] == "skipped"),
+        "elapsed_seconds": round(elapsed, 1),
+        "stories_per_hour": round(len(done) * 3600 / elapsed, 2) if elapsed else 0.0,
+        "tokens_per_story": round(sum(tokens) / len(tokens)) if tokens else 0,
+        "llm_calls": sum(result["llm_calls"] for result in done),
+        "llm_calls_budget_remaining": budget.remaining() if budget is not None else None,
+        "results": results
+    }
+
+def load_worlds(args):
+    worlds = list(args.world or [])
+    if args.worlds_file:
+        with open(args.worlds_file, "r") as f:
+            worlds.extend(line.strip() for line in f if line.strip())
+    return worlds
+
+def main():
+    parser = argparse.ArgumentParser(description="Reimagine every story in a directory without the UI")
+    parser.add_argument("input_dir", help="Directory of stories (PDF, or plain text with any other extension)")
+    parser.add_argument("--world", action="append", help="World spec to reimagine into; repeat for several worlds per story")
+    parser.add_argument("--worlds-file", help="File with one world spec per line")
+    parser.add_argument("--workers", type=int, default=2, help="Stories processed concurrently")
+    parser.add_argument("--max-llm-calls", type=int, help="Global cap on LLM calls across all stories, retries included")
+    parser.add_argument("--output-dir", default="outputs/bulk", help="Where final stories and the report are written")
+    parser.add_argument("--scene-mode", default="sequential", choices=["sequential", "outline"])
+    parser.add_argument("--merge-mode", default="rolling", choices=["rolling", "tree"])
+    parser.add_argument("--bypass-cache", action="store_true")
+    parser.add_argument("--fresh", action="store_true", help="Discard checkpoints from earlier bulk runs instead of resuming them")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    worlds = load_worlds(args)
+    if not worlds:
+        parser.error("give at least one --world or a --worlds-file")
+
+    stories = discover_stories(args.input_dir)
+    if not stories:
+        parser.error(f"no stories found in {args.input_dir}")
+
+    limiter = get_rate_limiter(Config())
+    limiter.set_budget(args.max_llm_calls)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    logger.info(f"Reimagining {len(stories)} stories into {len(worlds)} world(s) with {args.workers} workers")
+    started = time.time()
+    results = []
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(process_story, path, worlds, args): path for path in stories}
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            logger.info(f"[{len(results)}/{len(stories)}] {result['status']}: {futures[future]}")
+
+    results.sort(key=lambda result: result["story"])
+    report = throughput_report(results, time.time() - started, limiter.budget)
+    report_path = atomic_write(
+        os.path.join(args.output_dir, f"bulk_report_{time.strftime('%Y%m%d-%H%M%S')}.json"),
+        json.dumps(report, indent=2)
+    )
+
+    print(f"Stories: {report['completed']}/{report['stories']} completed, {report['failed']} failed, {report['skipped']} skipped")
+    print(f"Throughput: {report['stories_per_hour']} stories/hour, {report['tokens_per_story']} tokens/story, {report['llm_calls']} LLM calls")
+    print(f"Report: {report_path}")
+    return 0 if report["completed"] == report["stories"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+def fingerprint_source(source):
+    digest = hashlib.sha256()
+    if source.endswith(".pdf") and os.path.exists(source):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    else:
+        digest.update(source.encode("utf-8"))
+    return digest.hexdigest()
+
+def fingerprint_data(*items):
+    payload = json.dumps(items, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class CheckpointStore:
+    def __init__(self, config):
+        self.config = config
+        self.manifest = {"signature": None, "stages": {}}
+        self._lock = threading.Lock()
+
+    def begin(self, signature):
+        try:
+            manifest = self.config.load_output("checkpoint.json", "checkpoints")
+        except (OSError, json.JSONDecodeError):
+            manifest = None
+
+        if manifest and manifest.get("signature") == signature:
+            logger.info(f"Resuming run {self.config.run_id}: {len(manifest['stages'])} stages already checkpointed")
+            self.manifest = manifest
+        else:
+            if manifest:
+                logger.info("Run inputs changed since the last checkpoint, starting over")
+            self.manifest = {"signature": signature, "stages": {}}
+
+    def has(self, stage):
+        with self._lock:
+            return stage in self.manifest["stages"]
+
+    def load(self, stage):
+        logger.info(f"Loading checkpointed stage: {stage}")
+        return self.config.load_output(f"{stage}.json", "checkpoints")["result"]
+
+    def save(self, stage, result):
+        # Wrapped so plain strings (paths, story text) round-trip through JSON too.
+        self.config.save_output({"result": result}, f"{stage}.json", "checkpoints")
+        with self._lock:
+            self.manifest["stages"][stage] = {"completed_at": time.time()}
+            self.config.save_output(self.manifest, "checkpoint.json", "checkpoints")
+
+    def load_partial(self, stage, inputs_key):
+        # Partial progress inside a stage (e.g. finished scenes) only counts for identical inputs.
+        try:
+            partial = self.config.load_output(f"{stage}.partial.json", "checkpoints")
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if partial.get("inputs") != inputs_key:
+            return {}
+        return partial["items"]
+
+    def save_partial(self, stage, inputs_key, item_key, value):
+        with self._lock:
+            items = self.load_partial(stage, inputs_key)
+            items[str(item_key)] = value
+            self.config.save_output({"inputs": inputs_key, "items": items}, f"{stage}.partial.json", "checkpoints")
@@ -1,45 +1,179 @@
+import copy
+import hashlib
 import json
 import os
 from dotenv import load_dotenv
 from prompts import get_prompt
+from llm_cache import LLMCache
+from prompt_context import PromptContextBuilder
+from tracing import Tracer
+from checkpoint import CheckpointStore
+from workspace import new_run_id, validate_run_id, atomic_write, collect_expired_runs
 
 load_dotenv()
 
+# Settings that change what the pipeline produces; checkpoint keys must cover all of them.
+OUTPUT_SETTINGS = [
+    "model_name", "temperature", "structured_output",
+    "chunking_mode", "chunk_size", "chunk_token_budget", "chunk_overlap_tokens",
+    "dna_merge_mode", "entity_prepass", "entity_min_mentions", "short_story_fast_path",
+    "scene_mode", "num_scenes", "scene_word_count", "target_word_count"
+]
+
 class Config:
     def __init__(self):
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.model_name = "gpt-4.1"
+        self.temperature = 1.0
+        self.request_timeout = 120
+        self.http_pool_size = 20
+        self.http_keepalive_expiry = 30
+        
+        self.llm_requests_per_minute = 500
+        self.llm_tokens_per_minute = 300000
+        self.llm_max_concurrency = 16
+        
+        self.retry_max_attempts = 3
+        self.retry_base_delay = 1.0
+        self.retry_max_delay = 20.0
+        self.retry_deadline = 300
+        self.structured_output = True
         self.chunk_size = 2000
+        self.chunking_mode = "words"
+        self.chunk_token_budget = 3000
+        self.chunk_overlap_tokens = 150
         self.target_word_count = 1500
         self.scene_word_count = 400
         self.num_scenes = 4
+        self.scene_mode = "sequential"
+        self.max_concurrency = 4
+        self.dna_merge_mode = "rolling"
+        self.incremental = True
+        self.short_story_fast_path = True
+        self.entity_prepass = True
+        self.entity_min_mentions = 2
+        
+        # Each worker holds its own PdfReader, so more processes cost memory as well as cores.
+        self.pdf_workers = min(4, os.cpu_count() or 1)
+        self.pdf_parallel_min_pages = 50
+        self.pdf_pages_per_batch = 16
+        self.pdf_max_pages_in_flight = 64
+        
+        self.cache_dir = "outputs/cache"
+        self.cache_bypass = False
+        self.cache_max_entries = 5000
+        self.cache_max_bytes = 200 * 1024 * 1024
+        self.cache_max_age_days = 30
+        self._cache = None
+        self._context_builder = None
+        self._tracer = None
+        self._checkpoints = None
+        self.checkpoint_interval = 5
         
+        self.job_workers = 2
+        self.job_max_pending = 20
+        self.job_retention_seconds = 3600
+        self.batch_concurrency = 3
+        self.batch_max_worlds = 10
+        
+        self.runs_dir = "outputs/runs"
+        self.manifests_dir = "outputs/manifests"
+        self.document_key = None
+        self.run_ttl_hours = 24
+        self.output_types = ["inputs", "chunks", "dna", "scenes", "final", "traces", "checkpoints"]
+        self.start_run()
+    
+    def start_run(self, run_id=None):
+        self.run_id = validate_run_id(run_id) if run_id else new_run_id()
         self.output_dirs = {
-            "chunks": "outputs/chunks",
-            "dna": "outputs/dna",
-            "scenes": "outputs/scenes",
-            "final": "outputs/final"
+            output_type: os.path.join(self.runs_dir, self.run_id, output_type)
+            for output_type in self.output_types
         }
+        self._tracer = None
+        self._checkpoints = None
+        return self.run_id
+    
+    def run_dir(self):
+        return os.path.join(self.runs_dir, self.run_id)
+    
+    def for_world(self, index):
+        # World sub-runs live under the batch workspace and share its cache, context stats and trace.
+        world_config = copy.copy(self)
+        world_config.runs_dir = os.path.join(self.run_dir(), "worlds")
+        world_config.start_run(f"world-{index + 1}")
+        world_config._cache = self.get_cache()
+        world_config._context_builder = self.get_context_builder()
+        world_config._tracer = self.get_tracer()
+        return world_config
+    
+    def collect_expired_runs(self):
+        return collect_expired_runs(self.runs_dir, self.run_ttl_hours * 3600, keep={self.run_id})
+    
+    def chunk_manifest_path(self):
+        # Every submission gets a new run, so a named document keeps its manifest outside the run
+        # workspace; reuse is by chunk hash, so a stale or shared manifest can only cost a cache miss.
+        if not self.document_key:
+            return self.output_path("chunk_manifest.json", "chunks")
+        digest = hashlib.sha256(self.document_key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.manifests_dir, f"{digest}.json")
+    
+    def output_settings(self):
+        return {name: getattr(self, name) for name in OUTPUT_SETTINGS}
     
     def get_prompt(self, prompt_name):
         return get_prompt(prompt_name)
     
+    def get_cache(self):
+        if self._cache is None:
+            self._cache = LLMCache(
+                self.cache_dir,
+                max_entries=self.cache_max_entries,
+                max_bytes=self.cache_max_bytes,
+                max_age_seconds=self.cache_max_age_days * 24 * 3600,
+                bypass=self.cache_bypass
+            )
+        return self._cache
+    
+    def get_context_builder(self):
+        if self._context_builder is None:
+            self._context_builder = PromptContextBuilder(self.model_name)
+        return self._context_builder
+    
+    def get_tracer(self):
+        if self._tracer is None:
+            self._tracer = Tracer(self.run_id)
+        return self._tracer
+    
+    def get_checkpoints(self):
+        if self._checkpoints is None:
+            self._checkpoints = CheckpointStore(self)
+        return self._checkpoints
+    
+    def cache_key(self, prompt_name, prompt_config, inputs):
+        return self.get_cache().make_key(
+            prompt_name,
+            prompt_config,
+            self.model_name,
+            self.temperature,
+            inputs
+        )
+    
+    def output_path(self, filename, output_type):
+        directory = self.output_dirs.get(output_type, self.run_dir())
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+    
     def save_output(self, content, filename, output_type):
-        directory = self.output_dirs.get(output_type, "outputs")
-        filepath = os.path.join(directory, filename)
+        filepath = self.output_path(filename, output_type)
         
         if isinstance(content, dict) or isinstance(content, list):
-            with open(filepath, "w") as f:
-                json.dump(content, f, indent=2)
-        else:
-            with open(filepath, "w") as f:
-                f.write(content)
-        
-        return filepath
+            return atomic_write(filepath, json.dumps(content, indent=2))
+        if isinstance(content, bytes):
+            return atomic_write(filepath, content, "wb")
+        return atomic_write(filepath, content)
     
     def load_output(self, filename, output_type):
-        directory = self.output_dirs.get(output_type, "outputs")
-        filepath = os.path.join(directory, filename)
+        filepath = self.output_path(filename, output_type)
         
         if filepath.endswith(".json"):
             with open(filepath, "r") as f:
@@ -0,0 +1,215 @@
+import re
+from collections import Counter, defaultdict
+
+FEMALE_TITLES = {"mrs", "ms", "miss", "madame", "mme", "lady", "aunt"}
+MALE_TITLES = {"mr", "sir", "lord", "uncle"}
+TITLES = FEMALE_TITLES | MALE_TITLES | {"dr", "captain"}
+NAME_WORD = r"(?:(?:Mr|Mrs|Ms|Miss|Dr|Madame|Mme|Sir|Lady|Lord|Captain|Aunt|Uncle)\.?\s+)?[A-Z][a-z]+"
+# Titles may follow a capitalized common word ("Then Mrs. Young"), which scan() strips afterwards.
+NAME_PATTERN = re.compile(rf"\b{NAME_WORD}(?:[ \t]+{NAME_WORD})*")
+SENTENCE_START = re.compile(r"(?:^|[.!?:;\"“”‘’(\[]\s*|\n\s*)$")
+COMMON_CAPITALIZED = {
+    "A", "An", "And", "As", "At", "But", "By", "For", "From", "He", "Her", "Here", "His", "How", "I", "If",
+    "In", "It", "Its", "My", "No", "Not", "Now", "Of", "Oh", "On", "One", "Or", "She", "So", "That", "The",
+    "Their", "Then", "There", "These", "They", "This", "Those", "To", "Two", "We", "What", "When", "Where",
+    "Which", "While", "Who", "Why", "With", "Yes", "You", "Your", "Christmas", "God", "Monday", "Tuesday",
+    "Wednesday", "Thursday", "Friday", "Saturday", "Sunday", "January", "February", "March", "April", "May",
+    "June", "July", "August", "September", "October", "November", "December"
+}
+
+def name_key(name):
+    name = re.sub(r"['’]s$", "", name.strip())
+    return " ".join(name.lower().replace(".", " ").split())
+
+def name_tokens(name):
+    return tuple(token for token in name_key(name).split() if token not in TITLES)
+
+def title_gender(key):
+    title = key.split()[0] if key else ""
+    if title in FEMALE_TITLES:
+        return "female"
+    if title in MALE_TITLES:
+        return "male"
+    return None
+
+def genders_match(first, second):
+    return first is None or second is None or first == second
+
+class EntityIndex:
+    def __init__(self, min_mentions=2, max_hints=12):
+        self.min_mentions = min_mentions
+        self.max_hints = max_hints
+        self.mentions = Counter()
+        self.forms = defaultdict(Counter)
+        self.mid_sentence = set()
+        self.chunk_mentions = {}
+        self._aliases = {}
+        self._groups = {}
+        self._dirty = False
+
+    def scan(self, text):
+        found = Counter()
+        mid_sentence = set()
+        for match in NAME_PATTERN.finditer(text):
+            words = match.group(0).split()
+            at_start = SENTENCE_START.search(text[max(0, match.start() - 3):match.start()]) is not None
+            # Nothing precedes a title inside a name, so "Later Mrs. Young" is just "Mrs. Young".
+            titled = [j for j, word in enumerate(words) if j and name_key(word) in TITLES]
+            if titled:
+                words = words[titled[-1]:]
+                at_start = False
+            while words and words[0] in COMMON_CAPITALIZED:
+                words = words[1:]
+                at_start = False
+            if not words or not name_tokens(" ".join(words)):
+                continue
+            name = " ".join(words)
+            found[name] += 1
+            if not at_start:
+                mid_sentence.add(name_key(name))
+        return found, mid_sentence
+
+    def add_chunk(self, i, chunk_paragraphs):
+        if i in self.chunk_mentions:
+            return
+        found, mid_sentence = self.scan("\n\n".join(chunk_paragraphs))
+        self.mid_sentence |= mid_sentence
+        per_key = Counter()
+        for name, count in found.items():
+            key = name_key(name)
+            self.mentions[key] += count
+            self.forms[key][name] += count
+            per_key[key] += count
+        self.chunk_mentions[i] = per_key
+        self._dirty = True
+
+    def add_chunks(self, chunks):
+        for i, chunk in enumerate(chunks):
+            self.add_chunk(i, chunk)
+
+    def is_name(self, key):
+        # A single capitalized word that only ever opens sentences ("Suddenly") is not a name.
+        if self.mentions[key] < self.min_mentions:
+            return False
+        return len(key.split()) > 1 or key in self.mid_sentence
+
+    @property
+    def aliases(self):
+        self.resolve()
+        return self._aliases
+
+    @property
+    def groups(self):
+        self.resolve()
+        return self._groups
+
+    def resolve(self):
+        # Coreference by name shape: "Della", "Mrs. Young" and "Della Young" collapse into the
+        # most specific full name whose tokens contain them, unless that would be ambiguous.
+        if not self._dirty:
+            return
+        candidates = [key for key in self.mentions if self.is_name(key)]
+        full_names = sorted(candidates, key=lambda key: (-len(name_tokens(key)), -self.mentions[key], key))
+        aliases = {}
+        for key in full_names:
+            tokens = set(name_tokens(key))
+            gender = title_gender(key)
+            heads = [
+                other for other in full_names
+                if other != key and aliases.get(other, other) == other
+                and len(name_tokens(other)) > len(tokens) and tokens <= set(name_tokens(other))
+                and genders_match(gender, title_gender(other))
+            ]
+            aliases[key] = heads[0] if len(heads) == 1 else key
+
+        groups = defaultdict(list)
+        for key, head in aliases.items():
+            groups[head].append(key)
+        self._aliases = aliases
+        self._dirty = False
+        self._groups = {head: sorted(members, key=lambda key: (-self.mentions[key], key)) for head, members in groups.items()}
+
+    def display_name(self, head):
+        # The head is the most specific full name; only its spelling comes from the text, so the
+        # name does not flip when an edit elsewhere shifts which alias is used most.
+        return self.forms[head].most_common(1)[0][0] if self.forms[head] else head
+
+    def group_of(self, name):
+        key = name_key(name)
+        if key in self.aliases:
+            return self.aliases[key]
+        tokens = set(name_tokens(name))
+        if not tokens:
+            return None
+        # Names the index never saw ("James Young") go to the one group sharing the most name tokens.
+        scores = {}
+        for head, members in self.groups.items():
+            overlaps = [
+                len(tokens & set(name_tokens(member))) for member in members
+                if tokens <= set(name_tokens(member)) or set(name_tokens(member)) <= tokens
+            ]
+            if overlaps:
+                scores[head] = max(overlaps)
+        if not scores:
+            return None
+        best = max(scores.values())
+        matches = [head for head, score in scores.items() if score == best]
+        return matches[0] if len(matches) == 1 else None
+
+    def canonical(self, name):
+        head = self.group_of(name)
+        return self.display_name(head) if head is not None else name.strip()
+
+    def chunk_characters(self, i):
+        counts = Counter()
+        for key, count in self.chunk_mentions.get(i, {}).items():
+            if key in self.aliases:
+                counts[self.aliases[key]] += count
+        return [head for head, _ in counts.most_common(self.max_hints)]
+
+    def chunk_hint(self, i):
+        # Only names and aliases seen in this chunk. Which names qualify and how they group is decided
+        # story-wide, so the hint can change with edits elsewhere; it is not part of the summary cache key.
+        lines = []
+        in_chunk = self.chunk_mentions.get(i, {})
+        for head in self.chunk_characters(i):
+            name = self.display_name(head)
+            members = sorted((member for member in self.groups[head] if member in in_chunk), key=lambda key: (-in_chunk[key], key))
+            aliases = [self.forms[member].most_common(1)[0][0] for member in members]
+            aliases = [alias for alias in aliases if alias != name]
+            suffix = f" (also: {', '.join(aliases)})" if aliases else ""
+            lines.append(f"- {name}{suffix}")
+        return "\n".join(lines) or "- none detected"
+
+    def dedupe_characters(self, characters):
+        merged = {}
+        for character in characters:
+            if not isinstance(character, dict) or not character.get("name"):
+                merged[len(merged)] = character
+                continue
+            name = self.canonical(character["name"])
+            key = name_key(name)
+            if key not in merged:
+                merged[key] = dict(character, name=name)
+                continue
+            for field, value in character.items():
+                if value and not merged[key].get(field):
+                    merged[key][field] = value
+        return list(merged.values())
+
+    def new_characters(self, known, characters):
+        known_keys = {name_key(self.canonical(character.get("name", ""))) for character in known if isinstance(character, dict)}
+        return [
+            character for character in characters
+            if not isinstance(character, dict) or name_key(self.canonical(character.get("name", ""))) not in known_keys
+        ]
+
+    def to_dict(self):
+        return {
+            head: {
+                "name": self.display_name(head),
+                "aliases": [self.forms[member].most_common(1)[0][0] for member in members],
+                "mentions": sum(self.mentions[member] for member in members)
+            }
+            for head, members in sorted(self.groups.items(), key=lambda item: -sum(self.mentions[m] for m in item[1]))
+        }
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+import httpx
+import openai
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+NAME_PATTERN = re.compile(r'"name":\s*"([^"]+)"')
+CAPITALIZED_WORD = re.compile(r"\b[A-Z][a-z]{2,}\b")
+SCENE_PLAN_LINE = re.compile(r"^\d+\. \[", re.M)
+TARGET_WORDS = re.compile(r"Target word count: (\d+)")
+FILLER_WORDS = ["the", "light", "moved", "across", "her", "quiet", "room", "and", "he", "waited", "for", "morning"]
+STOP_WORDS = {"The", "She", "Her", "His", "And", "But", "Then", "There", "That", "This", "When", "With", "One", "Two", "Three"}
+
+class FakeLLMStats:
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.prompt_bytes = 0
+        self.completion_bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, prompt_bytes, completion_bytes=0, failed=False):
+        with self._lock:
+            self.calls += 1
+            self.prompt_bytes += prompt_bytes
+            self.completion_bytes += completion_bytes
+            if failed:
+                self.failures += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "prompt_bytes": self.prompt_bytes,
+                "completion_bytes": self.completion_bytes
+            }
+
+def filler_text(words, seed):
+    offset = int(hashlib.sha256(seed.encode("utf-8")).hexdigest(), 16)
+    return " ".join(FILLER_WORDS[(offset + i) % len(FILLER_WORDS)] for i in range(words))
+
+def top_names(text, limit):
+    counts = {}
+    for word in CAPITALIZED_WORD.findall(text):
+        if word not in STOP_WORDS:
+            counts[word] = counts.get(word, 0) + 1
+    return sorted(counts, key=lambda name: (-counts[name], name))[:limit]
+
+def sample_value(schema, seed):
+    if "anyOf" in schema:
+        return sample_value(schema["anyOf"][0], seed)
+    kind = schema.get("type")
+    if kind == "object":
+        properties = schema.get("properties") or {"entry": schema.get("additionalProperties", {"type": "string"})}
+        return {key: sample_value(subschema, seed + key) for key, subschema in properties.items()}
+    if kind == "array":
+        return [sample_value(schema.get("items", {"type": "string"}), seed + str(i)) for i in range(max(1, schema.get("minItems", 1)))]
+    return filler_text(6, seed)
+
+def fake_reply(system, user):
+    if "JSON field fixer" in system:
+        field_schemas = json.loads(user.split("Required structure per field:")[1].split("\n\nReturn")[0])
+        return {path: sample_value(schema, path) for path, schema in field_schemas.items()}
+    if "story adapter" in system:
+        names = top_names(user, 4) or ["Narrator"]
+        return {
+            "story_dna": {
+                "plot_arc": {"setup": "A modest home.", "conflict": "No money for gifts.", "climax": "Each sells a treasure.", "resolution": "Love outweighs loss."},
+                "characters": [{"name": name, "role": "character", "core_trait": "devoted", "arc": "learns the value of sacrifice"} for name in names],
+                "themes": ["sacrifice", "love"],
+                "critical_moments": [f"{names[i % len(names)]} {filler_text(10, str(i))}" for i in range(6)],
+                "character_dynamics": "Devoted partners acting in secret for one another."
+            },
+            "new_world": {
+                "setting": "An orbital habitat above a dying world",
+                "era": "Year 2147",
+                "technology_or_magic": ["rationed fusion power"],
+                "culture": "Scarcity-driven and communal",
+                "tone": "Tender and bittersweet",
+                "world_rules": ["Credits are scarce"]
+            },
+            "mappings": {
+                "character_mappings": {name: f"{name} of the habitat" for name in names},
+                "conflict_mappings": {"lack of money": "lack of ration credits"},
+                "preserved_dynamics": ["mutual sacrifice"]
+            }
+        }
+    if "precision-focused literary analyst" in system:
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", user) if len(s.split()) > 4]
+        return {
+            "characters": [{"name": name, "role": "character", "trait": "unknown"} for name in top_names(user, 5)] or [{"name": "Narrator", "role": "narrator", "trait": "observant"}],
+            "events": [sentence[:120] for sentence in sentences[1:4]] or ["The chunk passes without incident."],
+            "themes": ["sacrifice", "love"]
+        }
+    if "narrative DNA curator" in system:
+        names = list(dict.fromkeys(NAME_PATTERN.findall(user)))[:10] or ["Narrator"]
+        return {
+            "characters": [{"name": name, "role": "character", "trait": "unknown"} for name in names],
+            "events": [f"Event {i + 1}: {filler_text(12, user[-200:] + str(i))}" for i in range(min(15, 3 + len(user) // 2000))],
+            "themes": ["sacrifice", "love", "poverty"]
+        }
+    if "master narrative distiller" in system:
+        names = list(dict.fromkeys(NAME_PATTERN.findall(user)))[:5] or ["Narrator"]
+        return {
+            "plot_arc": {"setup": "A modest home.", "conflict": "No money for gifts.", "climax": "Each sells a treasure.", "resolution": "Love outweighs loss."},
+            "characters": [{"name": name, "role": "character", "core_trait": "devoted", "arc": "learns the value of sacrifice"} for name in names],
+            "themes": ["sacrifice", "love"],
+            "critical_moments": [f"{names[i % len(names)]} {filler_text(10, str(i))}" for i in range(6)],
+            "character_dynamics": "Devoted partners acting in secret for one another."
+        }
+    if "high-precision world-builder" in system:
+        return {
+            "setting": "An orbital habitat above a dying world",
+            "era": "Year 2147",
+            "technology_or_magic": ["rationed fusion power", "memory-glass heirlooms"],
+            "culture": "Scarcity-driven and communal",
+            "tone": "Tender and bittersweet",
+            "world_rules": ["Credits are scarce", "Heirlooms carry status"]
+        }
+    if "narrative architect" in system:
+        names = list(dict.fromkeys(NAME_PATTERN.findall(user)))[:5] or ["Narrator"]
+        # Record arrays, the shape real models return for this prompt.
+        return {
+            "character_mappings": [
+                {"original_name": name, "new_name": f"{name} of the habitat", "new_role": "habitat resident"}
+                for name in names
+            ],
+            "conflict_mappings": [
+                {"original_conflict": "lack of money", "root_tension": "scarcity", "new_world_conflict": "lack of ration credits"}
+            ],
+            "preserved_dynamics": ["mutual sacrifice"]
+        }
+    if "story architect" in system:
+        count = len(SCENE_PLAN_LINE.findall(user))
+        return {"scenes": [{"position": str(i), "summary": filler_text(20, f"outline{i}")} for i in range(count)]}
+    if "professional fiction writer" in system:
+        match = TARGET_WORDS.search(user)
+        words = int(match.group(1)) if match else 400
+        return {"scene_text": filler_text(words, user[-300:]), "scene_summary": filler_text(30, user[:300])}
+    if "publication-grade" in system:
+        scenes = user.split("Story DNA for reference:")[0].replace("Scenes to combine:", "")
+        return scenes.replace("---SCENE BREAK---", "").strip()
+    return {"note": "unrecognized prompt"}
+
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.05
+    tokens_per_second: float = 500.0
+    failure_rate: float = 0.0
+    seed: int = 0
+    stats: Any = None
+    attempts: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.stats is None:
+            self.stats = FakeLLMStats()
+        self.attempts = {}
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _respond(self, messages):
+        system = messages[0].content
+        user = messages[1].content if len(messages) > 1 else ""
+        prompt_bytes = sum(len(message.content.encode("utf-8")) for message in messages)
+
+        prompt_id = hashlib.sha256((system + user).encode("utf-8")).hexdigest()
+        with self.stats._lock:
+            attempt = self.attempts.get(prompt_id, 0)
+            self.attempts[prompt_id] = attempt + 1
+
+        roll = int(hashlib.sha256(f"{self.seed}:{prompt_id}:{attempt}".encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        if roll < self.failure_rate:
+            time.sleep(self.latency)
+            self.stats.record(prompt_bytes, failed=True)
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://fake-llm.local/v1/chat/completions"))
+
+        reply = fake_reply(system, user)
+        content = reply if isinstance(reply, str) else "```json\n" + json.dumps(reply) + "\n```"
+        self.stats.record(prompt_bytes, len(content.encode("utf-8")))
+
+        usage = {
+            "input_tokens": prompt_bytes // 4,
+            "output_tokens": len(content) // 4,
+            "total_tokens": prompt_bytes // 4 + len(content) // 4
+        }
+        return content, usage
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        content, usage = self._respond(messages)
+        time.sleep(self.latency + usage["output_tokens"] / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=usage))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        content, usage = self._respond(messages)
+        time.sleep(self.latency)
+
+        pieces = re.findall(r"\S+\s*", content)
+        for piece in pieces:
+            time.sleep(max(1, len(piece) // 4) / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
@@ -0,0 +1,260 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pipeline import ReimaginationPipeline
+from workspace import atomic_write, validate_run_id
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed", "interrupted")
+
+STAGE_PROGRESS = {
+    "accumulated_dna": (30, "Step 2/5: Analyzing story DNA and defining new world..."),
+    "story_dna": (50, "Step 3/5: Building new world..."),
+    "transformation_map": (70, "Step 4/5: Generating scenes..."),
+    "scenes": (90, "Step 5/5: Polishing final story...")
+}
+
+class QueueFullError(Exception):
+    pass
+
+class Job:
+    def __init__(self, config, source, user_world_choice, source_file=None, world_choices=None):
+        self.config = config
+        self.run_id = config.run_id
+        self.source = source
+        self.source_file = source_file
+        self.user_world_choice = user_world_choice
+        self.world_choices = world_choices
+        self.status = "queued"
+        self.progress = 0
+        self.message = "Waiting for a free worker..."
+        self.error = None
+        self.results = {}
+        self.partial_story = ""
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+        self.persist()
+
+    def state(self):
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "status": self.status,
+                "progress": self.progress,
+                "message": self.message,
+                "error": self.error,
+                "user_world_choice": self.user_world_choice,
+                "world_choices": self.world_choices,
+                "source_file": self.source_file,
+                "document_key": self.config.document_key,
+                "submitted_at": self.submitted_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at
+            }
+
+    def snapshot(self):
+        state = self.state()
+        with self._lock:
+            state["results"] = dict(self.results)
+            state["partial_story"] = self.partial_story
+        return state
+
+    def persist(self):
+        atomic_write(os.path.join(self.config.run_dir(), "job.json"), json.dumps(self.state(), indent=2))
+
+class JobQueue:
+    def __init__(self, max_workers=2, max_pending=20):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.jobs = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reimagine-job")
+        self._lock = threading.Lock()
+
+    def prune(self, retention_seconds):
+        cutoff = time.time() - retention_seconds
+        with self._lock:
+            for run_id, job in list(self.jobs.items()):
+                # Finished jobs stay reachable through their workspace on disk.
+                if job.status in TERMINAL_STATUSES and job.finished_at and job.finished_at < cutoff:
+                    del self.jobs[run_id]
+
+    def submit(self, config, source, user_world_choice):
+        return self._enqueue(Job(config, source, user_world_choice, self._keep_source(config, source)))
+
+    def submit_batch(self, config, source, world_choices):
+        if len(world_choices) > config.batch_max_worlds:
+            raise ValueError(f"A batch can reimagine at most {config.batch_max_worlds} worlds")
+        return self._enqueue(Job(
+            config,
+            source,
+            f"{len(world_choices)} worlds",
+            self._keep_source(config, source),
+            list(world_choices)
+        ))
+
+    def _keep_source(self, config, source):
+        # Keep the source in the workspace so an interrupted job can be resumed later.
+        if source.endswith(".pdf"):
+            return source
+        return config.save_output(source, "source.txt", "inputs")
+
+    def resume(self, config, run_id):
+        job = self.get(run_id)
+        if job is not None and job.status not in TERMINAL_STATUSES:
+            return run_id
+
+        state = load_job_state(config, run_id)
+        if state is None or not state.get("source_file"):
+            raise ValueError(f"Run {run_id} cannot be resumed")
+
+        source_file = state["source_file"]
+        config.document_key = state.get("document_key")
+        if source_file.endswith(".pdf"):
+            source = source_file
+        else:
+            with open(source_file, "r") as f:
+                source = f.read()
+        logger.info(f"Resuming job {run_id}")
+        return self._enqueue(Job(
+            config,
+            source,
+            state["user_world_choice"],
+            source_file,
+            state.get("world_choices")
+        ))
+
+    def _enqueue(self, job):
+        self.prune(job.config.job_retention_seconds)
+        with self._lock:
+            active = sum(1 for other in self.jobs.values() if other.status not in TERMINAL_STATUSES)
+            if active >= self.max_workers + self.max_pending:
+                raise QueueFullError("Too many reimagination jobs are in progress, please try again shortly.")
+            self.jobs[job.run_id] = job
+
+        job.persist()
+        self._executor.submit(self._run, job)
+        logger.info(f"Queued job {job.run_id}")
+        return job.run_id
+
+    def _run(self, job):
+        job.update(status="running", started_at=time.time(), progress=10, message="Step 1/5: Extracting and chunking story...")
+
+        def on_stage_complete(name, result):
+            with job._lock:
+                job.results[name] = result
+            if name in STAGE_PROGRESS:
+                progress, message = STAGE_PROGRESS[name]
+                job.update(progress=progress, message=message)
+
+        try:
+            if job.world_choices:
+                self._run_batch(job)
+                return
+
+            pipeline = ReimaginationPipeline(job.config)
+            results = pipeline.run(job.source, job.user_world_choice, on_stage_complete, include_polish=False)
+
+            parts = []
+            with job.config.get_tracer().stage("polish"):
+                for token in pipeline.stream_final_story(results):
+                    parts.append(token)
+                    with job._lock:
+                        job.partial_story = "".join(parts)
+
+            with job._lock:
+                job.results["final_story"] = job.partial_story
+            job.config.get_tracer().save(job.config)
+            job.update(status="completed", progress=100, message="Complete!", finished_at=time.time())
+            logger.info(f"Job {job.run_id} completed")
+        except Exception as e:
+            logger.exception(f"Job {job.run_id} failed")
+            job.update(status="failed", error=str(e), message="Failed", finished_at=time.time())
+
+    def _run_batch(self, job):
+        total = len(job.world_choices)
+        finished = []
+
+        def on_world_complete(index, world):
+            finished.append(index)
+            with job._lock:
+                job.results.setdefault("worlds", [None] * total)[index] = world
+            job.update(
+                progress=30 + int(70 * len(finished) / total),
+                message=f"Reimagined {len(finished)}/{total} worlds..."
+            )
+
+        def on_dna_complete(name, result):
+            if name == "story_dna":
+                with job._lock:
+                    job.results["story_dna"] = result
+                job.update(progress=30, message=f"Reimagining {total} worlds...")
+
+        pipeline = ReimaginationPipeline(job.config)
+        job.update(message=f"Extracting story DNA once for {total} worlds...")
+        pipeline.run_batch(job.source, job.world_choices, on_dna_complete, on_world_complete)
+        job.config.get_tracer().save(job.config)
+        job.update(status="completed", progress=100, message="Complete!", finished_at=time.time())
+        logger.info(f"Batch job {job.run_id} completed")
+
+    def get(self, run_id):
+        with self._lock:
+            return self.jobs.get(run_id)
+
+    def status(self, config, run_id):
+        job = self.get(run_id)
+        if job is not None:
+            return job.snapshot()
+        return load_job_state(config, run_id)
+
+def load_job_state(config, run_id):
+    # Jobs from an earlier server process are only on disk; unfinished ones can never complete now.
+    try:
+        config.start_run(validate_run_id(run_id))
+    except ValueError:
+        return None
+
+    job_path = os.path.join(config.run_dir(), "job.json")
+    try:
+        with open(job_path, "r") as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+    if state["status"] not in TERMINAL_STATUSES:
+        state["status"] = "interrupted"
+        state["message"] = "The server restarted before this job finished."
+
+    results = {}
+    for key, filename, output_type in (
+        ("story_dna", "final_dna.json", "dna"),
+        ("transformation_map", "transformation_map.json", "dna"),
+        ("final_story", "final_story.txt", "final")
+    ):
+        if os.path.exists(config.output_path(filename, output_type)):
+            results[key] = config.load_output(filename, output_type)
+    if os.path.exists(config.output_path("batch.json", "final")):
+        results["worlds"] = config.load_output("batch.json", "final")
+    state["results"] = results
+    state["partial_story"] = results.get("final_story", "")
+    return state
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue(config):
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(config.job_workers, config.job_max_pending)
+        return _queue
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    def __init__(self, cache_dir, max_entries=5000, max_bytes=200 * 1024 * 1024, max_age_seconds=30 * 24 * 3600, bypass=False):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.by_prompt = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, prompt_name, prompt_config, model, temperature, inputs):
+        payload = json.dumps({
+            "prompt_name": prompt_name,
+            "prompt": prompt_config,
+            "model": model,
+            "temperature": temperature,
+            "inputs": inputs
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _record(self, hit, prompt_name):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.by_prompt[prompt_name or "unknown"]["hits"] += 1
+            else:
+                self.misses += 1
+                self.by_prompt[prompt_name or "unknown"]["misses"] += 1
+
+    def get(self, key, prompt_name=None):
+        if self.bypass:
+            self._record(False, prompt_name)
+            return None
+
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if self.max_age_seconds and age > self.max_age_seconds:
+                os.remove(path)
+                self._record(False, prompt_name)
+                return None
+
+            with open(path, "r") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            self._record(False, prompt_name)
+            return None
+
+        self._record(True, prompt_name)
+        logger.info(f"Cache hit for {prompt_name or entry.get('prompt_name', 'unknown')} ({key[:12]})")
+        return entry["value"]
+
+    def set(self, key, value, prompt_name=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"prompt_name": prompt_name, "value": value}, f)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.writes += 1
+            should_evict = self.writes % 50 == 0
+
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        entries = []
+        now = time.time()
+        removed = 0
+
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                if self.max_age_seconds and now - stat.st_mtime > self.max_age_seconds:
+                    self._remove(path)
+                    removed += 1
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total_bytes -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"Evicted {removed} cache entries")
+        return removed
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "by_prompt": {name: dict(counts) for name, counts in self.by_prompt.items()}
+            }
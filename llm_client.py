@@ -0,0 +1,68 @@
+import hashlib
+import logging
+import threading
+import httpx
+from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+_http_clients = {}
+_llms = {}
+_llm_factory = None
+_lock = threading.Lock()
+
+def set_llm_factory(factory):
+    # Lets offline tools (benchmarks, dry runs) replace ChatOpenAI with a local stand-in.
+    global _llm_factory
+    with _lock:
+        _llm_factory = factory
+        _llms.clear()
+
+def get_http_client(config):
+    key = (config.http_pool_size, config.http_keepalive_expiry, config.request_timeout)
+
+    with _lock:
+        if key not in _http_clients:
+            logger.info(f"Creating shared HTTP connection pool (size {config.http_pool_size})")
+            _http_clients[key] = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=config.http_pool_size,
+                    max_keepalive_connections=config.http_pool_size,
+                    keepalive_expiry=config.http_keepalive_expiry
+                ),
+                timeout=config.request_timeout
+            )
+        return _http_clients[key]
+
+def get_llm(config, temperature=None):
+    if temperature is None:
+        temperature = config.temperature
+
+    # Clients carry the API key, so sessions using different keys must never share one.
+    api_key_id = hashlib.sha256((config.openai_api_key or "").encode("utf-8")).hexdigest()
+    key = (config.model_name, temperature, api_key_id, config.http_pool_size)
+
+    with _lock:
+        if _llm_factory is not None:
+            if key not in _llms:
+                _llms[key] = _llm_factory(config, temperature)
+            return _llms[key]
+
+    http_client = get_http_client(config)
+
+    with _lock:
+        if key not in _llms:
+            logger.info(f"Creating shared LLM client for {config.model_name} (temperature {temperature})")
+            options = {
+                "model": config.model_name,
+                "temperature": temperature,
+                "http_client": http_client,
+                "stream_usage": True,
+                "request_timeout": config.request_timeout,
+                # call_with_retry owns retries; SDK-level retries would hide 429s from the limiter and tracer.
+                "max_retries": 0
+            }
+            if config.openai_api_key:
+                options["api_key"] = config.openai_api_key
+            _llms[key] = ChatOpenAI(**options)
+        return _llms[key]
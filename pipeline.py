@@ -0,0 +1,247 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from checkpoint import fingerprint_data, fingerprint_source
+from utils import is_fallback
+from story_processor import StoryProcessor
+from world_builder import WorldBuilder
+from scene_generator import SceneGenerator
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class StageGraph:
+    def __init__(self, max_workers=4, tracer=None, checkpoints=None):
+        self.max_workers = max_workers
+        self.tracer = tracer
+        self.checkpoints = checkpoints
+        self.stages = {}
+        self.degraded = set()
+    
+    def add_stage(self, name, func, deps=()):
+        self.stages[name] = (func, list(deps))
+    
+    def run_stage(self, name, func, args, deps=()):
+        if self.tracer is None:
+            result = func(*args)
+        else:
+            with self.tracer.stage(name):
+                result = func(*args)
+        
+        # Fallback results, and anything built from them, are recomputed on resume instead of restored.
+        if is_fallback(result) or any(dep in self.degraded for dep in deps):
+            self.degraded.add(name)
+            logger.warning(f"Stage {name} finished with fallback results, not checkpointing it")
+        elif self.checkpoints is not None:
+            self.checkpoints.save(name, result)
+        return result
+    
+    def run(self, on_stage_complete=None):
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+        
+        def finish(name, result):
+            results[name] = result
+            # Callbacks run on the calling thread so UI code (e.g. Streamlit) can use them.
+            if on_stage_complete:
+                on_stage_complete(name, result)
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                ready = [name for name, (_, deps) in pending.items() if all(dep in results for dep in deps)]
+                for name in ready:
+                    func, deps = pending.pop(name)
+                    if self.checkpoints is not None and self.checkpoints.has(name):
+                        finish(name, self.checkpoints.load(name))
+                        continue
+                    
+                    logger.info(f"Starting stage: {name}")
+                    future = executor.submit(self.run_stage, name, func, [results[dep] for dep in deps], deps)
+                    running[future] = name
+                
+                if not running:
+                    # Restoring checkpoints may have unblocked more stages; rescan before giving up.
+                    if ready:
+                        continue
+                    raise ValueError(f"Stages with unsatisfiable dependencies: {', '.join(pending)}")
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    finish(name, future.result())
+                    logger.info(f"Finished stage: {name}")
+        
+        return results
+
+class ReimaginationPipeline:
+    def __init__(self, config):
+        self.config = config
+        self.processor = StoryProcessor(config)
+        self.builder = WorldBuilder(config)
+        self.generator = SceneGenerator(config)
+    
+    def run_signature(self, source, user_world_choice):
+        return fingerprint_data(fingerprint_source(source), user_world_choice, self.config.output_settings())
+    
+    def use_fast_path(self, source):
+        if not self.config.short_story_fast_path or source.endswith(".pdf"):
+            return False
+        return self.processor.fits_single_chunk(source)
+    
+    def analyze_short_story(self, source, user_world_choice):
+        analysis = self.builder.analyze_short_story(source, user_world_choice)
+        if analysis is not None:
+            return analysis
+        
+        logger.warning("Falling back to the multi-call analysis path")
+        accumulated_dna = self.processor.build_global_dna(source)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            story_dna = executor.submit(self.processor.consolidate_final_dna, accumulated_dna, False)
+            new_world = executor.submit(self.builder.define_new_world, accumulated_dna, user_world_choice)
+            story_dna = story_dna.result()
+            transformation_map = self.builder.create_transformation_map(story_dna, new_world.result())
+        return {
+            "story_dna": story_dna,
+            "transformation_map": transformation_map
+        }
+    
+    def build_graph(self, source, user_world_choice, include_polish=True):
+        checkpoints = self.config.get_checkpoints()
+        checkpoints.begin(self.run_signature(source, user_world_choice))
+        graph = StageGraph(
+            max_workers=self.config.max_concurrency,
+            tracer=self.config.get_tracer(),
+            checkpoints=checkpoints
+        )
+        
+        if self.use_fast_path(source):
+            graph.add_stage("analysis", lambda: self.analyze_short_story(source, user_world_choice))
+            graph.add_stage("story_dna", lambda analysis: analysis["story_dna"], ["analysis"])
+            graph.add_stage("transformation_map", lambda analysis: analysis["transformation_map"], ["analysis"])
+        else:
+            graph.add_stage("accumulated_dna", lambda: self.processor.build_global_dna(source))
+            # World definition only needs themes, so it runs alongside final DNA consolidation.
+            graph.add_stage(
+                "new_world",
+                lambda dna: self.builder.define_new_world(dna, user_world_choice),
+                ["accumulated_dna"]
+            )
+            graph.add_stage(
+                "story_dna",
+                lambda dna: self.processor.consolidate_final_dna(dna, save=False),
+                ["accumulated_dna"]
+            )
+            graph.add_stage(
+                "transformation_map",
+                self.builder.create_transformation_map,
+                ["story_dna", "new_world"]
+            )
+        
+        graph.add_stage(
+            "saved_dna",
+            lambda dna: self.config.save_output(dna, "final_dna.json", "dna"),
+            ["story_dna"]
+        )
+        graph.add_stage(
+            "scenes",
+            self.generator.generate_scenes,
+            ["story_dna", "transformation_map"]
+        )
+        if include_polish:
+            graph.add_stage(
+                "final_story",
+                lambda scenes, dna: self.generator.polish_story(scenes, dna),
+                ["scenes", "story_dna"]
+            )
+        return graph
+    
+    def run(self, source, user_world_choice, on_stage_complete=None, include_polish=True):
+        self.config.collect_expired_runs()
+        graph = self.build_graph(source, user_world_choice, include_polish)
+        return graph.run(on_stage_complete)
+    
+    def run_world(self, story_dna, user_world_choice):
+        checkpoints = self.config.get_checkpoints()
+        checkpoints.begin(fingerprint_data(story_dna, user_world_choice, self.config.output_settings()))
+        graph = StageGraph(
+            max_workers=self.config.max_concurrency,
+            tracer=self.config.get_tracer(),
+            checkpoints=checkpoints
+        )
+        
+        graph.add_stage("new_world", lambda: self.builder.define_new_world(story_dna, user_world_choice))
+        graph.add_stage(
+            "transformation_map",
+            lambda new_world: self.builder.create_transformation_map(story_dna, new_world),
+            ["new_world"]
+        )
+        graph.add_stage(
+            "scenes",
+            lambda transformation_map: self.generator.generate_scenes(story_dna, transformation_map),
+            ["transformation_map"]
+        )
+        graph.add_stage(
+            "final_story",
+            lambda scenes: self.generator.polish_story(scenes, story_dna),
+            ["scenes"]
+        )
+        return graph.run()
+    
+    def run_batch(self, source, world_choices, on_stage_complete=None, on_world_complete=None):
+        if len(world_choices) > self.config.batch_max_worlds:
+            raise ValueError(f"A batch can reimagine at most {self.config.batch_max_worlds} worlds")
+        self.config.collect_expired_runs()
+        
+        # The story DNA depends only on the source, so it is extracted once for every world.
+        checkpoints = self.config.get_checkpoints()
+        checkpoints.begin(fingerprint_data(fingerprint_source(source), self.config.output_settings()))
+        graph = StageGraph(
+            max_workers=self.config.max_concurrency,
+            tracer=self.config.get_tracer(),
+            checkpoints=checkpoints
+        )
+        graph.add_stage("accumulated_dna", lambda: self.processor.build_global_dna(source))
+        graph.add_stage(
+            "story_dna",
+            lambda dna: self.processor.consolidate_final_dna(dna),
+            ["accumulated_dna"]
+        )
+        story_dna = graph.run(on_stage_complete)["story_dna"]
+        
+        def reimagine(index, user_world_choice):
+            world_config = self.config.for_world(index)
+            try:
+                results = ReimaginationPipeline(world_config).run_world(story_dna, user_world_choice)
+            except Exception as e:
+                logger.exception(f"World {index + 1} failed")
+                return {"world": user_world_choice, "run_id": world_config.run_id, "error": str(e)}
+            return {
+                "world": user_world_choice,
+                "run_id": world_config.run_id,
+                "transformation_map": results["transformation_map"],
+                "final_story": results["final_story"]
+            }
+        
+        worlds = [None] * len(world_choices)
+        max_workers = max(1, min(self.config.batch_concurrency, len(world_choices)))
+        logger.info(f"Reimagining story into {len(world_choices)} worlds ({max_workers} concurrent)")
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(reimagine, i, user_world_choice): i
+                for i, user_world_choice in enumerate(world_choices)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                worlds[index] = future.result()
+                if on_world_complete:
+                    on_world_complete(index, worlds[index])
+        
+        self.config.save_output(worlds, "batch.json", "final")
+        return {
+            "story_dna": story_dna,
+            "worlds": worlds
+        }
+    
+    def stream_final_story(self, results):
+        return self.generator.polish_story_stream(results["scenes"], results["story_dna"])
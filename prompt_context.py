@@ -0,0 +1,112 @@
+import json
+import logging
+import threading
+from utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+def compact_json(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+def mentions_any(value, names):
+    text = compact_json(value).lower() if not isinstance(value, str) else value.lower()
+    return any(name in text for name in names)
+
+class PromptContextBuilder:
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def serialize(self, stage, data, full_data=None):
+        compact = compact_json(data)
+        baseline = json.dumps(data if full_data is None else full_data, indent=2)
+
+        sent = count_tokens(compact, self.model_name)
+        saved = count_tokens(baseline, self.model_name) - sent
+
+        with self._lock:
+            self.tokens_sent += sent
+            self.tokens_saved += saved
+
+        logger.info(f"Prompt context for {stage}: {sent} tokens ({saved} saved)")
+        return compact
+
+    def character_names(self, characters):
+        names = []
+        for character in characters:
+            name = character.get("name", "") if isinstance(character, dict) else str(character)
+            if name:
+                names.append(name)
+        return names
+
+    def relevant_names(self, story_dna, source_moment):
+        moment_text = compact_json(source_moment).lower()
+        relevant = []
+
+        for name in self.character_names(story_dna.get("characters", [])):
+            parts = [name.lower()] + [part.lower() for part in name.split() if len(part) > 2]
+            if any(part in moment_text for part in parts):
+                relevant.extend(parts)
+
+        return relevant
+
+    def filter_characters(self, characters, names):
+        return [c for c in characters if mentions_any(c.get("name", "") if isinstance(c, dict) else c, names)]
+
+    def filter_mappings(self, mappings, names):
+        if isinstance(mappings, dict):
+            return {key: value for key, value in mappings.items() if mentions_any(key, names) or mentions_any(value, names)}
+        if isinstance(mappings, list):
+            return [item for item in mappings if mentions_any(item, names)]
+        return mappings
+
+    def scene_context(self, story_dna, transformation_map, source_moment):
+        names = self.relevant_names(story_dna, source_moment)
+        characters = story_dna.get("characters", [])
+        mappings = transformation_map.get("mappings", {})
+        character_mappings = mappings.get("character_mappings", {})
+
+        # The protagonist is often only a pronoun in a moment, so always keep the first listed character.
+        protagonist = self.character_names(characters[:1])
+        if names and protagonist:
+            names += [protagonist[0].lower()]
+
+        # Moments that mention nobody by name still need a cast, so keep everyone.
+        if names:
+            characters = self.filter_characters(characters, names) or characters
+            character_mappings = self.filter_mappings(character_mappings, names) or character_mappings
+
+        dna_context = {
+            "plot_arc": story_dna.get("plot_arc", {}),
+            "themes": story_dna.get("themes", []),
+            "characters": characters,
+            "source_moment": source_moment
+        }
+        map_context = {
+            "new_world": transformation_map.get("new_world", {}),
+            "mappings": {
+                "character_mappings": character_mappings,
+                "conflict_mappings": mappings.get("conflict_mappings", {}),
+                "preserved_dynamics": mappings.get("preserved_dynamics", [])
+            }
+        }
+        return dna_context, map_context
+
+    def mapping_dna(self, story_dna):
+        return {key: value for key, value in story_dna.items() if key != "critical_moments"}
+
+    def polish_dna(self, story_dna):
+        return {
+            "plot_arc": story_dna.get("plot_arc", {}),
+            "themes": story_dna.get("themes", []),
+            "characters": self.character_names(story_dna.get("characters", []))
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tokens_sent": self.tokens_sent,
+                "tokens_saved": self.tokens_saved
+            }
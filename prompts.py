@@ -10,6 +10,7 @@ STRICT RULES:
 - No fabrication. No guessing beyond the chunk.
 - No global context. Ignore anything not explicitly inside the provided text.
 - Keep character descriptions extremely short (max 10 words).
+- Use the exact names from the character index; aliases listed there are the same person.
 - Events must be chronological and only from this chunk.
 - Themes must be grounded in clearly observable text patterns.
 - Entire JSON output must be under 300 words.
@@ -20,7 +21,10 @@ PROCESS:
 3. Extract plot events in exact order they occur.
 4. Derive themes ONLY if supported by the text.
 5. Produce clean, valid JSON following the specified format.""",
-        "user": """Extract a structured summary from this story chunk:
+        "user": """Characters named in this chunk (canonical name, then other names used for them here):
+{known_characters}
+
+Extract a structured summary from this story chunk:
 
 {chunk_text}
 
@@ -63,6 +67,35 @@ New Chunk Summary:
 Merge the new information into the global DNA and return updated JSON."""
     },
 
+    "pairwise_dna_merge": {
+        "system": """You are a narrative DNA curator.
+Your role is to combine two DNA fragments that cover adjacent, consecutive parts of the same story.
+
+PRIMARY GOAL:
+Merge the EARLIER fragment and the LATER fragment into one consistent DNA without losing established facts.
+
+STRICT RULES:
+- Everything in the EARLIER fragment happens before everything in the LATER fragment.
+- Events from the EARLIER fragment must come first, followed by events from the LATER fragment.
+- Merge duplicates logically (same characters or events).
+- Maintain max 10 characters and 15 events; prioritize importance.
+- Never invent information that is not in either fragment.
+
+PROCESS:
+1. Read both fragments carefully.
+2. Identify duplicate characters (same entity, different wording) and merge them.
+3. Concatenate events in chronological order, collapsing only true duplicates.
+4. Union the themes, merging near-synonyms.
+5. Output merged DNA in clean JSON with keys: characters, events, themes.""",
+        "user": """EARLIER DNA fragment:
+{earlier_dna}
+
+LATER DNA fragment:
+{later_dna}
+
+Merge the two fragments and return the combined DNA as JSON."""
+    },
+
     "final_dna_consolidation": {
         "system": """You are a master narrative distiller.
 
@@ -153,6 +186,68 @@ Map characters and conflicts into the new world.
 Return JSON with: character_mappings, conflict_mappings, preserved_dynamics."""
     },
 
+    "short_story_analysis": {
+        "system": """You are a story adapter preparing a short story for reimagination in a single pass.
+
+PRIMARY GOAL:
+Read the complete story once and produce, together: its distilled story DNA, a new world built from the user's request, and a mapping of the story's characters and conflicts into that world.
+
+STRICT RULES:
+- Use ONLY information present in the story; never invent events or characters.
+- Story DNA: 3–5 main characters (name, role, core trait, arc), 5–7 critical moments, 2–3 themes, a 4-part plot arc (setup, conflict, climax, resolution), and character dynamics.
+- New world: setting, era, technology_or_magic, culture, tone, world_rules; consistent with the user's request and the story's themes.
+- Mappings: recast every main character and conflict in the new world while keeping roles, relationships and emotional motivations identical.
+- Keep each part concise.
+- Output ONLY valid JSON.
+
+PROCESS:
+1. Distill the narrative backbone of the story.
+2. Design the new world around the user's request.
+3. Map characters, conflicts and dynamics into the new world.
+4. Return all three parts in one JSON object.""",
+        "user": """Story:
+{story_text}
+
+User requested setting: {user_world_choice}
+
+Return ONLY valid JSON with three keys:
+story_dna (plot_arc, characters, themes, critical_moments, character_dynamics),
+new_world (setting, era, technology_or_magic, culture, tone, world_rules),
+mappings (character_mappings, conflict_mappings, preserved_dynamics)."""
+    },
+
+    "scene_outline": {
+        "system": """You are a story architect planning a reimagined narrative before any prose is written.
+
+PRIMARY GOAL:
+Produce a compact, scene-by-scene outline so that each scene can be drafted independently and still read as one continuous story.
+
+STRICT RULES:
+- Exactly one outline entry per planned scene, in the given order.
+- Each entry is a 2-3 sentence summary of what happens in that scene.
+- Use the transformed characters and the new world setting.
+- Carry concrete continuity details forward (names, objects, locations, emotional state).
+- Each scene must end where the next one begins.
+- Output ONLY valid JSON.
+
+PROCESS:
+1. Read the story DNA and transformation map.
+2. Assign each planned scene its source moment and narrative purpose.
+3. Write the summaries so consecutive scenes hand off cleanly.
+4. Check the outline covers setup, conflict, climax and resolution.""",
+        "user_template": """Story DNA:
+{story_dna}
+
+New World & Characters:
+{transformation_map}
+
+Planned scenes:
+{scene_plan}
+
+Return ONLY valid JSON in this format:
+{{"scenes": [{{"position": "...", "summary": "..."}}]}}"""
+    },
+
     "scene_generation": {
         "system": """You are a professional fiction writer specializing in adaptive narrative retellings.
 
@@ -220,6 +315,28 @@ Story DNA for reference:
 {story_dna}
 
 Combine scenes smoothly into a coherent, polished story. Output TEXT ONLY (no JSON)."""
+    },
+
+    "field_repair": {
+        "system": """You are a JSON field fixer.
+A structured document you produced is valid JSON but some fields are missing or malformed.
+
+STRICT RULES:
+- Fix ONLY the listed fields. Do not repeat or change anything else.
+- Keep fixed values consistent with the rest of the document.
+- Each value must match the structure given for its field.
+
+Return ONLY a JSON object mapping each listed field path to its corrected value.""",
+        "user": """Document:
+{document}
+
+Problems:
+{problems}
+
+Required structure per field:
+{field_schemas}
+
+Return {{\"<field path>\": <corrected value>}} for the listed fields only."""
     }
 }
 
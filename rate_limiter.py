@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def is_throttle_error(error):
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, httpx.TimeoutException)):
+        return True
+    return getattr(error, "status_code", None) == 429
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class BudgetExhausted(Exception):
+    pass
+
+class CallBudget:
+    def __init__(self, max_calls):
+        self.max_calls = max_calls
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def spend(self):
+        with self._lock:
+            if self.used >= self.max_calls:
+                raise BudgetExhausted(f"LLM call budget of {self.max_calls} calls is exhausted")
+            self.used += 1
+
+    def remaining(self):
+        with self._lock:
+            return max(0, self.max_calls - self.used)
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+class RateLimiter:
+    def __init__(self, requests_per_minute, tokens_per_minute, max_concurrency, initial_concurrency=4, min_concurrency=1, completion_tokens_estimate=1000):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(min(initial_concurrency, max_concurrency))
+        self.completion_tokens_estimate = completion_tokens_estimate
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.budget = None
+        self._cond = threading.Condition()
+
+    def set_budget(self, max_calls):
+        # A process-wide cap on provider calls (retries included); cache hits never reach the limiter.
+        self.budget = CallBudget(max_calls) if max_calls is not None else None
+
+    def estimate_tokens(self, *texts):
+        return sum(len(str(text)) for text in texts) // 4 + self.completion_tokens_estimate
+
+    def acquire(self, estimated_tokens):
+        # A request larger than the whole per-minute budget would otherwise wait forever.
+        estimated_tokens = min(estimated_tokens, self.tokens.capacity)
+        if self.budget is not None:
+            self.budget.spend()
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+
+                wait = max(
+                    self.paused_until - now,
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(estimated_tokens)
+                )
+                if wait <= 0 and self.in_flight < int(self.concurrency_limit):
+                    self.requests.level -= 1
+                    self.tokens.level -= estimated_tokens
+                    self.in_flight += 1
+                    return
+
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, outcome, retry_after=None):
+        with self._cond:
+            self.in_flight -= 1
+
+            if outcome == "success":
+                self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1.0 / self.concurrency_limit)
+            elif outcome == "throttled":
+                self.throttled += 1
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+                self.paused_until = max(self.paused_until, time.monotonic() + (retry_after or 1.0))
+                logger.warning(f"LLM provider throttled, concurrency limit now {int(self.concurrency_limit)}")
+
+            self._cond.notify_all()
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        with self._cond:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated_tokens - actual_tokens)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, estimated_tokens):
+        self.acquire(estimated_tokens)
+        outcome = "success"
+        retry_after = None
+        try:
+            yield
+        except Exception as e:
+            if is_throttle_error(e):
+                outcome = "throttled"
+                retry_after = retry_after_seconds(e)
+            else:
+                outcome = "error"
+            raise
+        finally:
+            self.release(outcome, retry_after)
+
+    def call(self, func, estimated_tokens):
+        with self.slot(estimated_tokens):
+            response = func()
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage and usage.get("total_tokens"):
+            self.record_usage(estimated_tokens, usage["total_tokens"])
+        return response
+
+    def stats(self):
+        with self._cond:
+            return {
+                "concurrency_limit": int(self.concurrency_limit),
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+                "budget_remaining": self.budget.remaining() if self.budget is not None else None
+            }
+
+def get_rate_limiter(config):
+    key = (config.llm_requests_per_minute, config.llm_tokens_per_minute, config.llm_max_concurrency)
+
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(
+                config.llm_requests_per_minute,
+                config.llm_tokens_per_minute,
+                config.llm_max_concurrency,
+                initial_concurrency=config.max_concurrency
+            )
+        return _limiters[key]
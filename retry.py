@@ -0,0 +1,263 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+import httpx
+import openai
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from rate_limiter import BudgetExhausted, get_rate_limiter
+from schemas import apply_fixes, response_format, schema_at, schema_errors
+from utils import parse_json_response
+
+logger = logging.getLogger(__name__)
+
+FATAL_ERRORS = (
+    openai.AuthenticationError,
+    openai.PermissionDeniedError,
+    openai.BadRequestError,
+    openai.NotFoundError,
+    BudgetExhausted
+)
+
+TRANSIENT_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+    httpx.TransportError
+)
+
+class ParseError(Exception):
+    def __init__(self, message, parsed=None):
+        super().__init__(message)
+        # Set when the JSON parsed but failed validation, so the broken fields can be repaired in place.
+        self.parsed = parsed
+
+class LLMCallAborted(Exception):
+    pass
+
+class RetryMetrics:
+    def __init__(self):
+        self.counters = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def record(self, label, event):
+        with self._lock:
+            self.counters[label][event] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {label: dict(events) for label, events in self.counters.items()}
+
+metrics = RetryMetrics()
+
+def classify_error(error):
+    if isinstance(error, ParseError):
+        return "parse"
+    if isinstance(error, FATAL_ERRORS):
+        return "fatal"
+    if isinstance(error, TRANSIENT_ERRORS):
+        return "transient"
+    # Unknown failures were always retried before; keep doing so, with backoff.
+    return "transient"
+
+def backoff_delay(config, attempt):
+    ceiling = min(config.retry_max_delay, config.retry_base_delay * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+def json_parser(validate=None, description="JSON"):
+    def parse(content):
+        parsed = parse_json_response(content)
+        if not parsed:
+            raise ParseError(f"Response was not valid {description}.")
+        # Validators read fields with .get(); a bare array must be re-prompted, not retried as a transient error.
+        if not isinstance(parsed, dict):
+            raise ParseError(f"Response was a JSON {type(parsed).__name__}, expected a {description} object.")
+        if validate and not validate(parsed):
+            raise ParseError(f"Response JSON did not match the required {description} structure.", parsed)
+        return parsed
+    return parse
+
+def usage_tokens(message):
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+def invoke_llm(config, llm, messages):
+    limiter = get_rate_limiter(config)
+    estimated_tokens = limiter.estimate_tokens(*[message.content for message in messages])
+    response = limiter.call(lambda: llm.invoke(messages), estimated_tokens)
+    return response.content, usage_tokens(response)
+
+def repair_fields(config, llm, label, parse, parsed, schema):
+    # Asks for only the invalid fields instead of re-sending the full prompt. Returns (result, usage),
+    # with result None when the fix did not work out; only fatal errors propagate.
+    errors = schema_errors(schema, parsed)
+    if not errors or not all(error.path for error in errors):
+        return None, (0, 0)
+
+    logger.warning(f"{label}: invalid fields: {'; '.join(map(str, errors))}. Requesting a targeted fix")
+    metrics.record(label, "field_repairs")
+    prompt = config.get_prompt("field_repair")
+    field_schemas = {error.path: schema_at(schema, error.path) for error in errors}
+    messages = [
+        SystemMessage(content=prompt["system"]),
+        HumanMessage(content=prompt["user"].format(
+            document=json.dumps(parsed, ensure_ascii=False),
+            problems="\n".join(f"- {error}" for error in errors),
+            field_schemas=json.dumps(field_schemas, ensure_ascii=False)
+        ))
+    ]
+    if config.structured_output:
+        llm = llm.bind(response_format={"type": "json_object"})
+
+    try:
+        content, usage = invoke_llm(config, llm, messages)
+    except Exception as e:
+        if classify_error(e) == "fatal":
+            raise
+        logger.warning(f"{label}: targeted fix failed: {e}")
+        return None, (0, 0)
+
+    fixes = parse_json_response(content)
+    repaired, applied = apply_fixes(parsed, fixes, errors) if isinstance(fixes, dict) else (parsed, 0)
+    if not applied:
+        logger.warning(f"{label}: targeted fix returned none of the requested fields")
+        return None, usage
+    try:
+        result = parse(json.dumps(repaired))
+    except ParseError as e:
+        logger.warning(f"{label}: still invalid after targeted fix: {e}")
+        return None, usage
+
+    metrics.record(label, "field_repair_successes")
+    return result, usage
+
+def stream_with_retry(config, llm, label, messages):
+    # Failures before the first token are retried like call_with_retry. Once text has reached the
+    # caller a retry would repeat it, so a failure mid-stream aborts instead.
+    limiter = get_rate_limiter(config)
+    tracer = config.get_tracer()
+    estimated_tokens = limiter.estimate_tokens(*[message.content for message in messages])
+    started = time.monotonic()
+    deadline = started + config.retry_deadline
+    max_attempts = config.retry_max_attempts
+
+    def trace(attempts, outcome, usage=(0, 0)):
+        tracer.record_call(label, time.monotonic() - started, usage[0], usage[1], attempts, outcome)
+
+    for attempt in range(max_attempts):
+        logger.info(f"{label} (attempt {attempt + 1}/{max_attempts})")
+        metrics.record(label, "attempts")
+        usage = (0, 0)
+        streamed = False
+
+        try:
+            with limiter.slot(estimated_tokens):
+                for chunk in llm.stream(messages):
+                    if chunk.usage_metadata:
+                        usage = usage_tokens(chunk)
+                    if chunk.content:
+                        streamed = True
+                        yield chunk.content
+            metrics.record(label, "successes")
+            trace(attempt + 1, "success", usage)
+            return
+        except Exception as e:
+            kind = classify_error(e)
+            metrics.record(label, f"{kind}_errors")
+
+            if kind == "fatal" or streamed:
+                logger.error(f"{label} aborted: {e}")
+                trace(attempt + 1, "aborted", usage)
+                raise LLMCallAborted(f"{label} failed: {e}") from e
+
+            logger.warning(f"{label}: transient error: {e}")
+            delay = backoff_delay(config, attempt)
+
+        if attempt + 1 < max_attempts:
+            if time.monotonic() + delay > deadline:
+                logger.error(f"{label}: deadline of {config.retry_deadline}s reached")
+                metrics.record(label, "deadline_exceeded")
+                break
+            time.sleep(delay)
+
+    trace(attempt + 1, "exhausted")
+    metrics.record(label, "exhausted")
+    raise LLMCallAborted(f"{label} failed after {attempt + 1} attempts")
+
+def call_with_retry(config, llm, label, messages, parse, schema=None):
+    repair_llm = llm
+    if schema is not None and config.structured_output:
+        llm = llm.bind(response_format=response_format(schema))
+
+    tracer = config.get_tracer()
+    started = time.monotonic()
+    deadline = started + config.retry_deadline
+    max_attempts = config.retry_max_attempts
+    attempt_messages = list(messages)
+    prompt_tokens = 0
+    completion_tokens = 0
+
+    def trace(attempts, outcome):
+        tracer.record_call(label, time.monotonic() - started, prompt_tokens, completion_tokens, attempts, outcome)
+
+    for attempt in range(max_attempts):
+        logger.info(f"{label} (attempt {attempt + 1}/{max_attempts})")
+        metrics.record(label, "attempts")
+        content = None
+
+        try:
+            content, (used_prompt, used_completion) = invoke_llm(config, llm, attempt_messages)
+            prompt_tokens += used_prompt
+            completion_tokens += used_completion
+            result = parse(content)
+            metrics.record(label, "successes")
+            trace(attempt + 1, "success")
+            return result
+        except Exception as e:
+            kind = classify_error(e)
+            metrics.record(label, f"{kind}_errors")
+
+            if kind == "fatal":
+                logger.error(f"{label} aborted: {e}")
+                trace(attempt + 1, "aborted")
+                raise LLMCallAborted(f"{label} failed with a non-retryable error: {e}") from e
+
+            if kind == "parse" and schema is not None and e.parsed is not None:
+                try:
+                    result, (used_prompt, used_completion) = repair_fields(config, repair_llm, label, parse, e.parsed, schema)
+                except Exception as repair_error:
+                    logger.error(f"{label} aborted: {repair_error}")
+                    trace(attempt + 1, "aborted")
+                    raise LLMCallAborted(f"{label} failed with a non-retryable error: {repair_error}") from repair_error
+                prompt_tokens += used_prompt
+                completion_tokens += used_completion
+                if result is not None:
+                    metrics.record(label, "successes")
+                    trace(attempt + 1, "repaired")
+                    return result
+
+            if kind == "parse":
+                logger.warning(f"{label}: {e} Re-prompting for a corrected response")
+                attempt_messages = list(messages) + [
+                    AIMessage(content=content),
+                    HumanMessage(content=f"{e} Return the complete, corrected output only, with no commentary.")
+                ]
+                delay = 0.0
+            else:
+                logger.warning(f"{label}: transient error: {e}")
+                delay = backoff_delay(config, attempt)
+
+        if attempt + 1 < max_attempts:
+            if time.monotonic() + delay > deadline:
+                logger.error(f"{label}: deadline of {config.retry_deadline}s reached")
+                metrics.record(label, "deadline_exceeded")
+                break
+            time.sleep(delay)
+
+    trace(attempt + 1, "exhausted")
+    metrics.record(label, "exhausted")
+    logger.error(f"{label}: giving up after retries")
+    return None
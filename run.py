@@ -9,10 +9,8 @@ def install_requirements():
 
 def create_directories():
     directories = [
-        "outputs/chunks",
-        "outputs/dna",
-        "outputs/scenes",
-        "outputs/final"
+        "outputs/runs",
+        "outputs/cache"
     ]
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
@@ -1,9 +1,12 @@
 import json
 import logging
-from langchain_openai import ChatOpenAI
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.messages import SystemMessage, HumanMessage
+from checkpoint import fingerprint_data
 from config import Config
-from utils import extract_json_from_response
+from llm_client import get_llm
+from retry import call_with_retry, json_parser, stream_with_retry
+from utils import Fallback, is_fallback
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -11,10 +14,10 @@ logger = logging.getLogger(__name__)
 class SceneGenerator:
     def __init__(self, config):
         self.config = config
-        self.llm = ChatOpenAI(
-            model=config.model_name,
-            temperature=1.0
-        )
+        self.llm = get_llm(config)
+        self.cache = config.get_cache()
+        self.context = config.get_context_builder()
+        self.tracer = config.get_tracer()
     
     def select_key_moments(self, story_dna):
         critical_moments = story_dna.get("critical_moments", [])
@@ -53,7 +56,54 @@ class SceneGenerator:
         logger.info(f"Scene plan created with {len(scene_plan)} scenes")
         return scene_plan
     
-    def generate_scene(self, story_dna, transformation_map, scene_info, previous_summary=None):
+    def create_scene_outline(self, story_dna, transformation_map, scene_plan):
+        logger.info("Creating scene outline")
+        
+        prompt_config = self.config.get_prompt("scene_outline")
+        system_prompt = prompt_config["system"]
+        
+        plan_lines = [
+            f"{info['index'] + 1}. [{info['position']}] {json.dumps(info['source_moment'])}"
+            for info in scene_plan
+        ]
+        user_prompt = prompt_config["user_template"].format(
+            story_dna=self.context.serialize("scene_outline", story_dna),
+            transformation_map=self.context.serialize("scene_outline", transformation_map),
+            scene_plan="\n".join(plan_lines)
+        )
+        
+        messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=user_prompt)
+        ]
+        
+        cache_key = self.config.cache_key("scene_outline", system_prompt, {"user_prompt": user_prompt})
+        cached = self.cache.get(cache_key, "scene_outline")
+        if cached is not None:
+            return cached
+        
+        parsed = call_with_retry(
+            self.config,
+            self.llm,
+            "Creating scene outline",
+            messages,
+            json_parser(
+                lambda outline: len(outline.get("scenes", [])) == len(scene_plan),
+                f"scene outline with exactly {len(scene_plan)} entries"
+            ),
+            schema="scene_outline"
+        )
+        
+        if parsed is not None:
+            outline = [entry.get("summary", "") for entry in parsed["scenes"]]
+            self.cache.set(cache_key, outline, "scene_outline")
+            logger.info("Scene outline created successfully")
+            return outline
+        
+        logger.error("Failed to create scene outline")
+        return None
+    
+    def generate_scene(self, story_dna, transformation_map, scene_info, previous_summary=None, outline=None):
         position = scene_info["position"]
         logger.info(f"Generating scene: {position}")
         
@@ -68,7 +118,15 @@ class SceneGenerator:
         requirements_str = ", ".join(requirements)
         
         previous_context = ""
-        if previous_summary:
+        if outline:
+            index = scene_info["index"]
+            outline_str = "\n".join(f"{i + 1}. {summary}" for i, summary in enumerate(outline))
+            previous_context = (
+                f"Full story outline:\n{outline_str}\n"
+                f"You are writing scene {index + 1}: {outline[index]}\n"
+                "Pick up exactly where the previous scene in the outline ends and hand off cleanly to the next one."
+            )
+        elif previous_summary:
             previous_context = f"Previous scene summary: {previous_summary}\nEnsure continuity with this."
         else:
             previous_context = "This is the opening scene."
@@ -79,8 +137,13 @@ class SceneGenerator:
         # Build messages directly using f-strings - NO TEMPLATES
         system_prompt = prompt_config["system"]
         
-        story_dna_str = json.dumps(story_dna, indent=2)
-        transformation_map_str = json.dumps(transformation_map, indent=2)
+        dna_context, map_context = self.context.scene_context(
+            story_dna,
+            transformation_map,
+            scene_info.get("source_moment", "")
+        )
+        story_dna_str = self.context.serialize("scene_generation", dna_context, story_dna)
+        transformation_map_str = self.context.serialize("scene_generation", map_context, transformation_map)
         
         user_prompt = f"""Story DNA:
 {story_dna_str}
@@ -105,44 +168,41 @@ Output ONLY valid JSON with two keys: scene_text and scene_summary"""
             HumanMessage(content=user_prompt)
         ]
         
-        max_retries = 3
-        for attempt in range(max_retries):
-            logger.info(f"Generating scene (attempt {attempt + 1}/{max_retries})")
-            
-            try:
-                response = self.llm.invoke(messages)
-                
-                parsed = extract_json_from_response(response.content)
-                
-                if parsed and "scene_text" in parsed:
-                    scene_text = parsed.get("scene_text", response.content)
-                    scene_summary = parsed.get("scene_summary", f"Scene {position} completed")
-                    logger.info(f"Scene {position} generated successfully")
-                    return {
-                        "text": scene_text,
-                        "summary": scene_summary,
-                        "position": position
-                    }
-                else:
-                    logger.warning(f"Failed to parse scene on attempt {attempt + 1}, using raw text")
-                    return {
-                        "text": response.content,
-                        "summary": f"Scene {position} completed",
-                        "position": position
-                    }
-            except Exception as e:
-                logger.error(f"Error generating scene: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
+        cache_key = self.config.cache_key("scene_generation", system_prompt, {"user_prompt": user_prompt})
+        cached = self.cache.get(cache_key, "scene_generation")
+        if cached is not None:
+            return cached
+        
+        parsed = call_with_retry(
+            self.config,
+            self.llm,
+            f"Generating scene {position}",
+            messages,
+            json_parser(lambda scene: bool(scene.get("scene_text")), "scene JSON with scene_text"),
+            schema="scene"
+        )
+        
+        if parsed is not None:
+            logger.info(f"Scene {position} generated successfully")
+            scene = {
+                "text": parsed["scene_text"],
+                "summary": parsed.get("scene_summary", f"Scene {position} completed"),
+                "position": position
+            }
+            self.cache.set(cache_key, scene, "scene_generation")
+            return scene
         
         logger.error(f"Failed to generate scene {position} after retries")
-        return {
+        return Fallback({
             "text": f"Scene {position} could not be generated.",
             "summary": f"Scene {position} failed",
             "position": position
-        }
+        })
     
     def polish_story(self, scenes, story_dna):
+        return "".join(self.polish_story_stream(scenes, story_dna))
+    
+    def polish_story_stream(self, scenes, story_dna):
         logger.info("Polishing final story")
         
         all_scenes_text = "\n\n---SCENE BREAK---\n\n".join([s["text"] for s in scenes])
@@ -156,7 +216,7 @@ Output ONLY valid JSON with two keys: scene_text and scene_summary"""
 {all_scenes_text}
 
 Story DNA for reference:
-{json.dumps(story_dna, indent=2)}
+{self.context.serialize("final_polish", self.context.polish_dna(story_dna), story_dna)}
 
 Combine these scenes with smooth transitions into a complete, polished story. Output the final story text only (no JSON)."""
         
@@ -165,34 +225,100 @@ Combine these scenes with smooth transitions into a complete, polished story. Ou
             HumanMessage(content=user_prompt)
         ]
         
-        response = self.llm.invoke(messages)
-        final_story = response.content
+        cache_key = self.config.cache_key("final_polish", system_prompt, {"user_prompt": user_prompt})
+        final_story = self.cache.get(cache_key, "final_polish")
+        
+        if final_story is not None:
+            yield final_story
+        else:
+            parts = []
+            for token in stream_with_retry(self.config, self.llm, "Polishing final story", messages):
+                parts.append(token)
+                yield token
+            final_story = "".join(parts)
+            self.cache.set(cache_key, final_story, "final_polish")
         
         self.config.save_output(final_story, "final_story.txt", "final")
         logger.info("Final story saved")
-        return final_story
     
-    def generate_full_story(self, story_dna, transformation_map):
-        scene_plan = self.create_scene_plan(story_dna)
-        
+    def save_scene(self, scene, scene_info):
+        self.config.save_output(
+            scene,
+            f"scene_{scene_info['index']}_{scene_info['position']}.json",
+            "scenes"
+        )
+    
+    def scene_inputs_key(self, story_dna, transformation_map, scene_plan):
+        return fingerprint_data(story_dna, transformation_map, scene_plan, self.config.output_settings())
+    
+    def generate_scenes_sequential(self, story_dna, transformation_map, scene_plan):
+        checkpoints = self.config.get_checkpoints()
+        inputs_key = self.scene_inputs_key(story_dna, transformation_map, scene_plan)
+        finished = checkpoints.load_partial("scenes", inputs_key)
         scenes = []
         previous_summary = None
         
         for scene_info in scene_plan:
-            scene = self.generate_scene(
-                story_dna,
-                transformation_map,
-                scene_info,
-                previous_summary
-            )
+            index = str(scene_info["index"])
+            if index in finished:
+                logger.info(f"Restored scene {scene_info['position']} from checkpoint")
+                scene = finished[index]
+            else:
+                scene = self.generate_scene(
+                    story_dna,
+                    transformation_map,
+                    scene_info,
+                    previous_summary
+                )
+                if not is_fallback(scene):
+                    checkpoints.save_partial("scenes", inputs_key, index, scene)
             scenes.append(scene)
             previous_summary = scene["summary"]
-            
-            self.config.save_output(
-                scene,
-                f"scene_{scene_info['index']}_{scene_info['position']}.json",
-                "scenes"
-            )
+            self.save_scene(scene, scene_info)
+        
+        return scenes
+    
+    def generate_scenes_from_outline(self, story_dna, transformation_map, scene_plan):
+        checkpoints = self.config.get_checkpoints()
+        inputs_key = self.scene_inputs_key(story_dna, transformation_map, scene_plan)
+        finished = checkpoints.load_partial("scenes", inputs_key)
+        
+        outline = finished.get("outline")
+        if outline is None:
+            outline = self.create_scene_outline(story_dna, transformation_map, scene_plan)
+            if outline is None:
+                logger.warning("Falling back to sequential scene generation")
+                return self.generate_scenes_sequential(story_dna, transformation_map, scene_plan)
+            checkpoints.save_partial("scenes", inputs_key, "outline", outline)
+        
+        def draft(scene_info):
+            index = str(scene_info["index"])
+            if index in finished:
+                logger.info(f"Restored scene {scene_info['position']} from checkpoint")
+                return finished[index]
+            scene = self.generate_scene(story_dna, transformation_map, scene_info, outline=outline)
+            if not is_fallback(scene):
+                checkpoints.save_partial("scenes", inputs_key, index, scene)
+            self.save_scene(scene, scene_info)
+            return scene
+        
+        max_workers = max(1, min(self.config.max_concurrency, len(scene_plan)))
+        logger.info(f"Drafting {len(scene_plan)} scenes concurrently from outline")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            scenes = list(executor.map(draft, scene_plan))
         
-        final_story = self.polish_story(scenes, story_dna)
+        return scenes
+    
+    def generate_scenes(self, story_dna, transformation_map):
+        scene_plan = self.create_scene_plan(story_dna)
+        
+        if self.config.scene_mode == "outline":
+            return self.generate_scenes_from_outline(story_dna, transformation_map, scene_plan)
+        return self.generate_scenes_sequential(story_dna, transformation_map, scene_plan)
+    
+    def generate_full_story(self, story_dna, transformation_map):
+        with self.tracer.stage("scene_generation"):
+            scenes = self.generate_scenes(story_dna, transformation_map)
+        with self.tracer.stage("polish"):
+            final_story = self.polish_story(scenes, story_dna)
         return final_story
\ No newline at end of file
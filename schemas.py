@@ -0,0 +1,337 @@
+import json
+import re
+from collections import namedtuple
+
+STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+CHARACTER = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "role": {"type": "string"},
+        "trait": {"type": "string"}
+    },
+    "required": ["name", "role", "trait"]
+}
+
+STRING_OR_LIST = {"anyOf": [{"type": "string"}, STRING_LIST]}
+
+# The consolidation prompts ask for a "core trait"; chunk summaries call the same field "trait".
+FINAL_CHARACTER = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "role": {"type": "string"},
+        "core_trait": {"type": "string"},
+        "trait": {"type": "string"},
+        "arc": {"type": "string"}
+    },
+    "required": ["name"]
+}
+
+STORY_DNA = {
+    "type": "object",
+    "properties": {
+        "characters": {"type": "array", "items": CHARACTER, "minItems": 1},
+        "events": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+        "themes": {"type": "array", "items": {"type": "string"}, "minItems": 1}
+    },
+    "required": ["characters", "events", "themes"]
+}
+
+FINAL_DNA = {
+    "type": "object",
+    "properties": {
+        "plot_arc": {
+            "type": "object",
+            "properties": {
+                "setup": {"type": "string"},
+                "conflict": {"type": "string"},
+                "climax": {"type": "string"},
+                "resolution": {"type": "string"}
+            },
+            "required": ["setup", "conflict", "climax", "resolution"]
+        },
+        "characters": {"type": "array", "items": FINAL_CHARACTER, "minItems": 1},
+        "themes": STRING_LIST,
+        "critical_moments": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+        "character_dynamics": STRING_OR_LIST
+    },
+    "required": ["plot_arc", "characters", "themes", "critical_moments"]
+}
+
+WORLD = {
+    "type": "object",
+    "properties": {
+        "setting": {"type": "string"},
+        "era": {"type": "string"},
+        "technology_or_magic": STRING_OR_LIST,
+        "culture": {"type": "string"},
+        "tone": {"type": "string"},
+        "world_rules": STRING_LIST
+    },
+    "required": ["setting", "era", "technology_or_magic", "culture", "tone", "world_rules"]
+}
+
+# Models return mappings either as {original: reimagined} objects or as arrays of records
+# such as {original_name, new_name, new_role, ...}; downstream prompts accept both.
+CHARACTER_MAPPING = {
+    "type": "object",
+    "properties": {
+        "original_name": {"type": "string"},
+        "original_role": {"type": "string"},
+        "core_trait": {"type": "string"},
+        "new_name": {"type": "string"},
+        "new_role": {"type": "string"},
+        "recast_identity": {"type": "string"}
+    },
+    "required": ["original_name", "new_name"]
+}
+
+CONFLICT_MAPPING = {
+    "type": "object",
+    "properties": {
+        "original_conflict": {"type": "string"},
+        "root_tension": {"type": "string"},
+        "new_world_conflict": {"type": "string"}
+    },
+    "required": ["original_conflict", "new_world_conflict"]
+}
+
+def mapping_schema(record, description):
+    return {
+        "anyOf": [
+            {"type": "array", "items": record, "minItems": 1},
+            {
+                "type": "object",
+                "description": description,
+                "additionalProperties": {"anyOf": [{"type": "string"}, {"type": "object"}]},
+                "minProperties": 1
+            }
+        ]
+    }
+
+TRANSFORMATION_MAPPINGS = {
+    "type": "object",
+    "properties": {
+        "character_mappings": mapping_schema(CHARACTER_MAPPING, "Original character name -> reimagined character"),
+        "conflict_mappings": mapping_schema(CONFLICT_MAPPING, "Original conflict -> reimagined conflict"),
+        "preserved_dynamics": STRING_LIST
+    },
+    "required": ["character_mappings", "conflict_mappings", "preserved_dynamics"]
+}
+
+SCENE = {
+    "type": "object",
+    "properties": {
+        "scene_text": {"type": "string", "minLength": 1},
+        "scene_summary": {"type": "string"}
+    },
+    "required": ["scene_text", "scene_summary"]
+}
+
+SCENE_OUTLINE = {
+    "type": "object",
+    "properties": {
+        "scenes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "position": {"type": "string"},
+                    "summary": {"type": "string"}
+                },
+                "required": ["position", "summary"]
+            }
+        }
+    },
+    "required": ["scenes"]
+}
+
+SHORT_STORY_ANALYSIS = {
+    "type": "object",
+    "properties": {
+        "story_dna": FINAL_DNA,
+        "new_world": WORLD,
+        "mappings": TRANSFORMATION_MAPPINGS
+    },
+    "required": ["story_dna", "new_world", "mappings"]
+}
+
+SCHEMAS = {
+    "story_dna": STORY_DNA,
+    "final_dna": FINAL_DNA,
+    "world_definition": WORLD,
+    "transformation_mappings": TRANSFORMATION_MAPPINGS,
+    "scene": SCENE,
+    "scene_outline": SCENE_OUTLINE,
+    "short_story_analysis": SHORT_STORY_ANALYSIS
+}
+
+def response_format(schema_name):
+    # Non-strict: strict mode cannot express the free-form mapping objects or the optional fields.
+    # The schema sent to the model is the one its response is validated against, so the two cannot drift.
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": schema_name,
+            "schema": SCHEMAS[schema_name],
+            "strict": False
+        }
+    }
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+PATH_TOKEN = re.compile(r'\.?([A-Za-z_][A-Za-z0-9_]*)|\[(\d+)\]|\[("(?:[^"\\]|\\.)*")\]')
+
+class SchemaError(namedtuple("SchemaError", ["path", "problem"])):
+    def __str__(self):
+        return f"{self.path or 'response'} {self.problem}"
+
+def join_path(path, key):
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    if IDENTIFIER.match(key):
+        return f"{path}.{key}" if path else key
+    return f"{path}[{json.dumps(key)}]"
+
+def split_path(path):
+    tokens = []
+    for name, index, quoted in PATH_TOKEN.findall(path):
+        if name:
+            tokens.append(name)
+        elif index:
+            tokens.append(int(index))
+        else:
+            tokens.append(json.loads(quoted))
+    return tokens
+
+def join_path_tokens(tokens):
+    path = ""
+    for token in tokens:
+        path = join_path(path, token)
+    return path
+
+def compile_object(schema):
+    properties = {key: compile_schema(subschema) for key, subschema in schema.get("properties", {}).items()}
+    extra = schema.get("additionalProperties")
+    extra = compile_schema(extra) if isinstance(extra, dict) else None
+    required = schema.get("required", [])
+    min_properties = schema.get("minProperties", 0)
+
+    def validate(value, path):
+        if not isinstance(value, dict):
+            return [SchemaError(path, "must be an object")]
+        errors = [SchemaError(join_path(path, key), "missing") for key in required if key not in value]
+        for key, item in value.items():
+            check = properties.get(key, extra)
+            if check is not None:
+                errors.extend(check(item, join_path(path, key)))
+        if len(value) < min_properties:
+            errors.append(SchemaError(path, "must not be empty" if min_properties == 1 else f"must have at least {min_properties} entries"))
+        return errors
+    return validate
+
+def compile_array(schema):
+    items = compile_schema(schema["items"]) if "items" in schema else None
+    min_items = schema.get("minItems", 0)
+
+    def validate(value, path):
+        if not isinstance(value, list):
+            return [SchemaError(path, "must be an array")]
+        errors = []
+        if len(value) < min_items:
+            errors.append(SchemaError(path, "must not be empty" if min_items == 1 else f"must have at least {min_items} items"))
+        if items is not None:
+            for i, item in enumerate(value):
+                errors.extend(items(item, join_path(path, i)))
+        return errors
+    return validate
+
+def compile_string(schema):
+    min_length = schema.get("minLength", 0)
+
+    def validate(value, path):
+        if not isinstance(value, str):
+            return [SchemaError(path, "must be a string")]
+        if len(value.strip()) < min_length:
+            return [SchemaError(path, "must not be empty")]
+        return []
+    return validate
+
+TYPE_NAMES = {"object": (dict, "an object"), "array": (list, "an array"), "string": (str, "a string")}
+
+def branch_for(schema, value):
+    for branch in schema["anyOf"]:
+        python_type = TYPE_NAMES.get(branch.get("type"), (object,))[0]
+        if isinstance(value, python_type):
+            return branch
+    return None
+
+def compile_any_of(schema):
+    # Branches differ by type, so the value's own type picks the branch whose errors are reported.
+    branches = [(TYPE_NAMES.get(branch.get("type"), (object,))[0], compile_schema(branch)) for branch in schema["anyOf"]]
+    expected = " or ".join(TYPE_NAMES[branch["type"]][1] for branch in schema["anyOf"] if branch.get("type") in TYPE_NAMES)
+
+    def validate(value, path):
+        for python_type, check in branches:
+            if isinstance(value, python_type):
+                return check(value, path)
+        return [SchemaError(path, f"must be {expected}")]
+    return validate
+
+def compile_schema(schema):
+    # Compiled once into nested closures, so validating a response is a walk over the data only.
+    if "anyOf" in schema:
+        return compile_any_of(schema)
+    compilers = {"object": compile_object, "array": compile_array, "string": compile_string}
+    compiler = compilers.get(schema.get("type"))
+    if compiler is None:
+        return lambda value, path: []
+    return compiler(schema)
+
+VALIDATORS = {name: compile_schema(schema) for name, schema in SCHEMAS.items()}
+
+def schema_errors(schema_name, value):
+    return VALIDATORS[schema_name](value, "")
+
+def schema_at(schema_name, path):
+    schema = SCHEMAS[schema_name]
+    for token in split_path(path):
+        if "anyOf" in schema:
+            schema = branch_for(schema, [] if isinstance(token, int) else {}) or {}
+        if isinstance(token, int):
+            schema = schema.get("items", {})
+        elif token in schema.get("properties", {}):
+            schema = schema["properties"][token]
+        else:
+            extra = schema.get("additionalProperties")
+            schema = extra if isinstance(extra, dict) else {}
+    return schema
+
+def apply_fixes(value, fixes, errors):
+    # Only fields named in the errors (or nested inside them) may be replaced; anything else the
+    # model sends back is ignored so a repair can never rewrite valid content.
+    allowed = [error.path for error in errors if error.path]
+    repaired = json.loads(json.dumps(value))
+    applied = 0
+
+    for path, fix in fixes.items():
+        if not any(path == allowed_path or path.startswith((allowed_path + ".", allowed_path + "[")) for allowed_path in allowed):
+            continue
+        tokens = split_path(path)
+        if not tokens or join_path_tokens(tokens) != path:
+            continue
+        target = repaired
+        try:
+            for token in tokens[:-1]:
+                target = target[token]
+            if isinstance(target, list) != isinstance(tokens[-1], int):
+                continue
+            if isinstance(tokens[-1], int) and tokens[-1] == len(target):
+                target.append(fix)
+            else:
+                target[tokens[-1]] = fix
+        except (KeyError, IndexError, TypeError):
+            continue
+        applied += 1
+    return repaired, applied
@@ -1,45 +1,104 @@
+import hashlib
 import json
 import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from PyPDF2 import PdfReader
-from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from config import Config
-from utils import extract_json_from_response, validate_story_dna, validate_final_dna
+from entity_index import EntityIndex
+from llm_client import get_llm
+from retry import call_with_retry, json_parser
+from utils import Fallback, is_fallback, validate_story_dna, validate_final_dna, count_tokens, split_sentences
+from workspace import atomic_write
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+_worker_reader = None
+
+def open_worker_reader(pdf_path):
+    # Runs once per worker process, so each worker parses the PDF structure a single time.
+    global _worker_reader
+    _worker_reader = PdfReader(pdf_path)
+
+def extract_page_range(start, end):
+    return [_worker_reader.pages[i].extract_text() for i in range(start, end)]
+
 class StoryProcessor:
     def __init__(self, config):
         self.config = config
-        self.llm = ChatOpenAI(
-            model=config.model_name,
-            temperature=1.0
-        )
+        self.llm = get_llm(config)
+        self.cache = config.get_cache()
+        self.context = config.get_context_builder()
+        self.tracer = config.get_tracer()
+        self.entities = None
+    
+    def iter_pdf_pages(self, pdf_path):
+        logger.info(f"Streaming pages from PDF: {pdf_path}")
+        reader = PdfReader(pdf_path)
+        num_pages = len(reader.pages)
+        workers = min(self.config.pdf_workers, num_pages)
+        
+        if workers <= 1 or num_pages < self.config.pdf_parallel_min_pages:
+            for page in reader.pages:
+                yield page.extract_text()
+            return
+        
+        yield from self.iter_pdf_pages_parallel(pdf_path, num_pages, workers)
+    
+    def iter_pdf_pages_parallel(self, pdf_path, num_pages, workers):
+        # Smaller batches when the page cap is tight, so every worker still gets one.
+        max_in_flight = max(1, self.config.pdf_max_pages_in_flight)
+        batch_size = max(1, min(self.config.pdf_pages_per_batch, num_pages // workers, max_in_flight // workers))
+        ranges = [(start, min(start + batch_size, num_pages)) for start in range(0, num_pages, batch_size)]
+        logger.info(f"Extracting {num_pages} pages with {workers} processes in {len(ranges)} batches")
+        
+        # Submit a sliding window capped in pages, not batches, so extracted text never piles up
+        # far ahead of the consumer however the batch size and worker count are tuned.
+        pending = deque()
+        pages_in_flight = 0
+        next_range = 0
+        
+        # Spawned, not forked: this process already runs job, stage and HTTP threads whose held
+        # locks a forked child would inherit.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=open_worker_reader,
+            initargs=(pdf_path,)
+        ) as executor:
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and (not pending or pages_in_flight + batch_size <= max_in_flight):
+                    start, end = ranges[next_range]
+                    pending.append((executor.submit(extract_page_range, start, end), end - start))
+                    pages_in_flight += end - start
+                    next_range += 1
+                
+                future, page_count = pending.popleft()
+                pages_in_flight -= page_count
+                for page_text in future.result():
+                    yield page_text
     
     def extract_text_from_pdf(self, pdf_path):
         logger.info(f"Extracting text from PDF: {pdf_path}")
-        reader = PdfReader(pdf_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n\n"
+        text = "".join(page + "\n\n" for page in self.iter_pdf_pages(pdf_path))
         logger.info(f"Extracted {len(text.split())} words from PDF")
         return text
     
-    def chunk_text(self, text):
-        logger.info("Chunking text into structured format")
-        words = text.split()
-        total_words = len(words)
-        
-        if total_words <= self.config.chunk_size:
-            chunks = [[text]]
-            self.config.save_output(chunks, "chunks.json", "chunks")
-            logger.info(f"Created 1 chunk (short text)")
-            return chunks
-        
-        paragraphs = text.split("\n\n")
+    def iter_paragraphs(self, pages):
+        for page in pages:
+            for para in page.split("\n\n"):
+                yield para
+    
+    def iter_chunks(self, paragraphs):
+        if self.config.chunking_mode == "tokens":
+            yield from self.iter_token_chunks(paragraphs)
+            return
         
-        chunks = []
         current_page = []
         current_word_count = 0
         
@@ -51,7 +110,7 @@ class StoryProcessor:
             para_words = len(para.split())
             
             if current_word_count + para_words > self.config.chunk_size and current_page:
-                chunks.append(current_page)
+                yield current_page
                 current_page = []
                 current_word_count = 0
             
@@ -59,13 +118,142 @@ class StoryProcessor:
             current_word_count += para_words
         
         if current_page:
-            chunks.append(current_page)
+            yield current_page
+    
+    def fits_single_chunk(self, text):
+        if self.config.chunking_mode == "tokens":
+            return self.count_tokens(text) <= self.config.chunk_token_budget
+        return len(text.split()) <= self.config.chunk_size
+    
+    def count_tokens(self, text):
+        return count_tokens(text, self.config.model_name)
+    
+    def split_words(self, text, budget):
+        words = text.split()
+        tokens = self.count_tokens(text)
+        if tokens <= budget or len(words) == 1:
+            return [(text, tokens)]
+        middle = len(words) // 2
+        return self.split_words(" ".join(words[:middle]), budget) + self.split_words(" ".join(words[middle:]), budget)
+    
+    def split_oversized_paragraph(self, para, budget):
+        pieces = []
+        current = []
+        current_tokens = 0
+        
+        for sentence in split_sentences(para):
+            for text, tokens in self.split_words(sentence, budget):
+                # Token counts are not additive across a join, so measure the joined piece itself.
+                joined_tokens = self.count_tokens(" ".join(current + [text])) if current else tokens
+                if joined_tokens > budget and current:
+                    pieces.append((" ".join(current), current_tokens))
+                    current = [text]
+                    current_tokens = tokens
+                else:
+                    current.append(text)
+                    current_tokens = joined_tokens
+        
+        if current:
+            pieces.append((" ".join(current), current_tokens))
+        return pieces
+    
+    def overlap_tail(self, pieces, overlap):
+        tail = []
+        tail_tokens = 0
+        
+        for text, _ in reversed(pieces):
+            for sentence in reversed(split_sentences(text)):
+                joined_tokens = self.count_tokens(" ".join(reversed(tail + [sentence])))
+                if joined_tokens > overlap:
+                    return " ".join(reversed(tail)), tail_tokens
+                tail.append(sentence)
+                tail_tokens = joined_tokens
+        
+        return " ".join(reversed(tail)), tail_tokens
+    
+    def iter_token_chunks(self, paragraphs):
+        budget = self.config.chunk_token_budget
+        overlap = min(self.config.chunk_overlap_tokens, budget // 2)
+        current_page = []
+        current_tokens = 0
+        has_new_content = False
+        
+        for para in paragraphs:
+            para = para.strip()
+            if not para:
+                continue
+            
+            para_tokens = self.count_tokens(para)
+            if para_tokens > budget:
+                pieces = self.split_oversized_paragraph(para, budget - overlap)
+            else:
+                pieces = [(para, para_tokens)]
+            
+            for text, tokens in pieces:
+                if current_tokens + tokens > budget and has_new_content:
+                    yield [piece for piece, _ in current_page]
+                    
+                    tail, tail_tokens = self.overlap_tail(current_page, overlap) if overlap else ("", 0)
+                    if tail and tail_tokens + tokens <= budget:
+                        current_page = [(tail, tail_tokens)]
+                        current_tokens = tail_tokens
+                    else:
+                        current_page = []
+                        current_tokens = 0
+                    has_new_content = False
+                
+                current_page.append((text, tokens))
+                current_tokens += tokens
+                has_new_content = True
+        
+        if has_new_content:
+            yield [piece for piece, _ in current_page]
+    
+    def stream_chunks_to_disk(self, chunks, fingerprints):
+        filepath = self.config.output_path("chunks.json", "chunks")
+        tmp_path = f"{filepath}.{os.getpid()}.tmp"
+        count = 0
+        
+        with open(tmp_path, "w") as f:
+            f.write("[")
+            for chunk in chunks:
+                f.write(",\n" if count else "\n")
+                f.write(json.dumps(chunk))
+                f.flush()
+                fingerprints.append(self.fingerprint_chunk(chunk))
+                count += 1
+                logger.info(f"Streamed chunk {count}")
+                yield chunk
+            f.write("\n]")
+        os.replace(tmp_path, filepath)
+        
+        logger.info(f"Streamed {count} chunks to {filepath}")
+    
+    def chunk_text(self, text):
+        logger.info("Chunking text into structured format")
+        
+        if self.config.chunking_mode == "tokens":
+            chunks = list(self.iter_token_chunks(text.split("\n\n"))) or [[text]]
+            self.config.save_output(chunks, "chunks.json", "chunks")
+            logger.info(f"Created {len(chunks)} chunks (token budget {self.config.chunk_token_budget})")
+            return chunks
+        
+        words = text.split()
+        total_words = len(words)
+        
+        if total_words <= self.config.chunk_size:
+            chunks = [[text]]
+            self.config.save_output(chunks, "chunks.json", "chunks")
+            logger.info(f"Created 1 chunk (short text)")
+            return chunks
+        
+        chunks = list(self.iter_chunks(text.split("\n\n")))
         
         self.config.save_output(chunks, "chunks.json", "chunks")
         logger.info(f"Created {len(chunks)} chunks")
         return chunks
     
-    def generate_local_summary(self, chunk_paragraphs):
+    def generate_local_summary(self, chunk_paragraphs, known_characters="- none detected"):
         chunk_text = "\n\n".join(chunk_paragraphs)
         
         prompt_config = self.config.get_prompt("local_summary")
@@ -74,30 +262,148 @@ class StoryProcessor:
             ("user", prompt_config["user"])
         ])
         
-        chain = prompt | self.llm
+        inputs = {"chunk_text": chunk_text, "known_characters": known_characters}
+        # The hint follows story-wide name decisions, so an edit in another chunk can change it.
+        # Keying on it would re-summarize untouched chunks; merges canonicalize names afterwards anyway.
+        cache_key = self.config.cache_key(
+            "local_summary",
+            prompt_config,
+            {"chunk_text": chunk_text, "entity_prepass": self.config.entity_prepass}
+        )
+        cached = self.cache.get(cache_key, "local_summary")
+        if cached is not None:
+            return cached
         
-        max_retries = 3
-        for attempt in range(max_retries):
-            logger.info(f"Generating local summary (attempt {attempt + 1}/{max_retries})")
-            
-            try:
-                response = chain.invoke({"chunk_text": chunk_text})
-                parsed = extract_json_from_response(response.content)
-                
-                if parsed and validate_story_dna(parsed):
-                    logger.info("Local summary generated successfully")
-                    return parsed
-                else:
-                    logger.warning(f"Invalid DNA structure on attempt {attempt + 1}")
-            except Exception as e:
-                logger.error(f"Error generating local summary: {e}")
+        parsed = call_with_retry(
+            self.config,
+            self.llm,
+            "Generating local summary",
+            prompt.format_messages(**inputs),
+            json_parser(validate_story_dna, "story DNA"),
+            schema="story_dna"
+        )
+        
+        if parsed is not None:
+            self.cache.set(cache_key, parsed, "local_summary")
+            logger.info("Local summary generated successfully")
+            return parsed
         
         logger.error("Failed to generate valid local summary after retries")
-        return {
+        return Fallback({
             "characters": [],
             "events": ["Failed to extract events"],
             "themes": []
+        })
+    
+    def fingerprint_chunk(self, chunk_paragraphs):
+        payload = json.dumps(chunk_paragraphs, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def summary_signature(self):
+        prompt_config = self.config.get_prompt("local_summary")
+        return self.config.cache_key("local_summary", prompt_config, {})
+    
+    def load_chunk_manifest(self):
+        try:
+            with open(self.config.chunk_manifest_path(), "r") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        
+        if manifest.get("signature") != self.summary_signature():
+            logger.info("Chunk manifest was built with a different prompt or model, ignoring it")
+            return None
+        return manifest
+    
+    def save_chunk_manifest(self, fingerprints, local_summaries, dna_states):
+        entries = []
+        for i, (fingerprint, summary) in enumerate(zip(fingerprints, local_summaries)):
+            dna_state = dna_states[i] if i < len(dna_states) else None
+            # Failed chunks are stored as None so the next run summarizes and merges them again.
+            entries.append({
+                "hash": fingerprint,
+                "summary": None if is_fallback(summary) else summary,
+                "dna_state": None if is_fallback(dna_state) else dna_state
+            })
+        
+        manifest = {
+            "signature": self.summary_signature(),
+            "merge_mode": self.config.dna_merge_mode,
+            "chunks": entries
         }
+        return atomic_write(self.config.chunk_manifest_path(), json.dumps(manifest, indent=2))
+    
+    def find_first_dirty(self, fingerprints, manifest):
+        previous = manifest["chunks"] if manifest else []
+        for i, fingerprint in enumerate(fingerprints):
+            if i >= len(previous) or previous[i]["hash"] != fingerprint:
+                return i
+        return len(fingerprints)
+    
+    def reusable_dna_states(self, fingerprints, manifest):
+        states = []
+        if not manifest or manifest.get("merge_mode") != "rolling":
+            return states
+        
+        for fingerprint, entry in zip(fingerprints, manifest["chunks"]):
+            if entry["hash"] != fingerprint or entry.get("dna_state") is None:
+                break
+            states.append(entry["dna_state"])
+        return states
+    
+    def generate_local_summaries(self, chunks, known_summaries=None, on_complete=None):
+        known_summaries = known_summaries or {}
+        max_workers = max(1, self.config.max_concurrency)
+        logger.info(f"Generating local summaries ({max_workers} concurrent)")
+        
+        def summarize(i, chunk, known_characters):
+            fingerprint = self.fingerprint_chunk(chunk)
+            if fingerprint in known_summaries:
+                logger.info(f"Reusing summary for unchanged chunk {i+1}")
+                summary = known_summaries[fingerprint]
+            else:
+                logger.info(f"Processing chunk {i+1}")
+                summary = self.generate_local_summary(chunk, known_characters)
+            
+            if on_complete:
+                on_complete(i, summary)
+            return summary
+        
+        # Chunks may come from a lazy page stream; cap how far parsing runs ahead of the LLM calls.
+        in_flight = threading.BoundedSemaphore(max_workers * 2)
+        futures = []
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for i, chunk in enumerate(chunks):
+                # Indexed on this thread so each chunk's hint is the same however the workers interleave.
+                known_characters = "- none detected"
+                if self.entities is not None:
+                    self.entities.add_chunk(i, chunk)
+                    known_characters = self.entities.chunk_hint(i)
+                in_flight.acquire()
+                future = executor.submit(summarize, i, chunk, known_characters)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
+            
+            local_summaries = [future.result() for future in futures]
+        
+        logger.info(f"Generated {len(local_summaries)} local summaries")
+        return local_summaries
+    
+    def carry_fallback(self, result, *inputs):
+        # A merge built on a failed summary or merge is missing that chunk, so it is degraded too.
+        return Fallback(result) if any(is_fallback(item) for item in inputs) else result
+    
+    def dedupe_characters(self, dna):
+        if self.entities is None or not isinstance(dna, dict):
+            return dna
+        return type(dna)(dna, characters=self.entities.dedupe_characters(dna.get("characters", [])))
+    
+    def without_known_characters(self, known_dna, dna):
+        # Characters the index already ties to the known DNA need no second round of LLM deduplication.
+        if self.entities is None:
+            return dna
+        return dict(dna, characters=self.entities.new_characters(known_dna.get("characters", []), dna.get("characters", [])))
     
     def update_global_dna(self, current_dna, new_summary):
         prompt_config = self.config.get_prompt("rolling_dna_update")
@@ -106,32 +412,120 @@ class StoryProcessor:
             ("user", prompt_config["user"])
         ])
         
-        chain = prompt | self.llm
+        inputs = {
+            "current_dna": self.context.serialize("rolling_dna_update", current_dna),
+            "new_summary": self.context.serialize("rolling_dna_update", self.without_known_characters(current_dna, new_summary))
+        }
+        cache_key = self.config.cache_key("rolling_dna_update", prompt_config, inputs)
+        cached = self.cache.get(cache_key, "rolling_dna_update")
+        if cached is not None:
+            return self.carry_fallback(cached, current_dna, new_summary)
         
-        max_retries = 3
-        for attempt in range(max_retries):
-            logger.info(f"Updating global DNA (attempt {attempt + 1}/{max_retries})")
-            
-            try:
-                response = chain.invoke({
-                    "current_dna": json.dumps(current_dna, indent=2),
-                    "new_summary": json.dumps(new_summary, indent=2)
-                })
-                
-                parsed = extract_json_from_response(response.content)
-                
-                if parsed and validate_story_dna(parsed):
-                    logger.info("Global DNA updated successfully")
-                    return parsed
-                else:
-                    logger.warning(f"Invalid DNA structure on attempt {attempt + 1}")
-            except Exception as e:
-                logger.error(f"Error updating global DNA: {e}")
+        parsed = call_with_retry(
+            self.config,
+            self.llm,
+            "Updating global DNA",
+            prompt.format_messages(**inputs),
+            json_parser(validate_story_dna, "story DNA"),
+            schema="story_dna"
+        )
+        
+        if parsed is not None:
+            parsed = self.dedupe_characters(parsed)
+            if not is_fallback([current_dna, new_summary]):
+                self.cache.set(cache_key, parsed, "rolling_dna_update")
+            logger.info("Global DNA updated successfully")
+            return self.carry_fallback(parsed, current_dna, new_summary)
         
         logger.error("Failed to update global DNA, returning current DNA")
-        return current_dna
+        return Fallback(current_dna)
+    
+    def merge_dna_pair(self, earlier_dna, later_dna):
+        prompt_config = self.config.get_prompt("pairwise_dna_merge")
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", prompt_config["system"]),
+            ("user", prompt_config["user"])
+        ])
+        
+        inputs = {
+            "earlier_dna": self.context.serialize("pairwise_dna_merge", earlier_dna),
+            "later_dna": self.context.serialize("pairwise_dna_merge", self.without_known_characters(earlier_dna, later_dna))
+        }
+        cache_key = self.config.cache_key("pairwise_dna_merge", prompt_config, inputs)
+        cached = self.cache.get(cache_key, "pairwise_dna_merge")
+        if cached is not None:
+            return self.carry_fallback(cached, earlier_dna, later_dna)
+        
+        parsed = call_with_retry(
+            self.config,
+            self.llm,
+            "Merging DNA pair",
+            prompt.format_messages(**inputs),
+            json_parser(validate_story_dna, "story DNA"),
+            schema="story_dna"
+        )
+        
+        if parsed is not None:
+            parsed = self.dedupe_characters(parsed)
+            if not is_fallback([earlier_dna, later_dna]):
+                self.cache.set(cache_key, parsed, "pairwise_dna_merge")
+            logger.info("DNA pair merged successfully")
+            return self.carry_fallback(parsed, earlier_dna, later_dna)
+        
+        logger.error("Failed to merge DNA pair, concatenating fragments")
+        return Fallback(self.dedupe_characters({
+            "characters": earlier_dna.get("characters", []) + later_dna.get("characters", []),
+            "events": earlier_dna.get("events", []) + later_dna.get("events", []),
+            "themes": earlier_dna.get("themes", []) + later_dna.get("themes", [])
+        }))
     
-    def consolidate_final_dna(self, accumulated_dna):
+    def build_global_dna_rolling(self, local_summaries, previous_states=None, on_step=None):
+        logger.info("Building global DNA with rolling window")
+        dna_states = list(previous_states or [])
+        
+        if dna_states:
+            logger.info(f"Resuming rolling merge at chunk {len(dna_states)+1}/{len(local_summaries)}")
+        
+        for i in range(len(dna_states), len(local_summaries)):
+            logger.info(f"Updating DNA with chunk {i+1}/{len(local_summaries)}")
+            
+            if i == 0:
+                global_dna = local_summaries[i]
+            else:
+                global_dna = self.update_global_dna(dna_states[-1], local_summaries[i])
+            dna_states.append(global_dna)
+            
+            if on_step:
+                on_step(dna_states)
+        
+        return dna_states
+    
+    def build_global_dna_tree(self, local_summaries):
+        logger.info("Building global DNA with tree reduce")
+        level = list(local_summaries)
+        depth = 0
+        
+        while len(level) > 1:
+            depth += 1
+            pairs = [(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            carry = [level[-1]] if len(level) % 2 else []
+            logger.info(f"Merge level {depth}: {len(pairs)} pairs from {len(level)} fragments")
+            
+            max_workers = max(1, min(self.config.max_concurrency, len(pairs)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                merged = list(executor.map(lambda pair: self.merge_dna_pair(*pair), pairs))
+            
+            level = merged + carry
+        
+        if not level:
+            return {
+                "characters": [],
+                "events": [],
+                "themes": []
+            }
+        return level[0]
+    
+    def consolidate_final_dna(self, accumulated_dna, save=True):
         logger.info("Consolidating final story DNA")
         
         prompt_config = self.config.get_prompt("final_dna_consolidation")
@@ -140,62 +534,110 @@ class StoryProcessor:
             ("user", prompt_config["user"])
         ])
         
-        chain = prompt | self.llm
+        inputs = {
+            "accumulated_dna": self.context.serialize("final_dna_consolidation", accumulated_dna)
+        }
+        cache_key = self.config.cache_key("final_dna_consolidation", prompt_config, inputs)
+        cached = self.cache.get(cache_key, "final_dna_consolidation")
+        if cached is not None:
+            if save:
+                self.config.save_output(cached, "final_dna.json", "dna")
+            return self.carry_fallback(cached, accumulated_dna)
         
-        max_retries = 3
-        for attempt in range(max_retries):
-            logger.info(f"Consolidating final DNA (attempt {attempt + 1}/{max_retries})")
-            
-            try:
-                response = chain.invoke({
-                    "accumulated_dna": json.dumps(accumulated_dna, indent=2)
-                })
-                
-                parsed = extract_json_from_response(response.content)
-                
-                if parsed and validate_final_dna(parsed):
-                    self.config.save_output(parsed, "final_dna.json", "dna")
-                    logger.info("Final DNA consolidated and saved successfully")
-                    return parsed
-                else:
-                    logger.warning(f"Invalid final DNA structure on attempt {attempt + 1}")
-            except Exception as e:
-                logger.error(f"Error consolidating final DNA: {e}")
+        parsed = call_with_retry(
+            self.config,
+            self.llm,
+            "Consolidating final DNA",
+            prompt.format_messages(**inputs),
+            json_parser(validate_final_dna, "final DNA"),
+            schema="final_dna"
+        )
+        
+        if parsed is not None:
+            if not is_fallback(accumulated_dna):
+                self.cache.set(cache_key, parsed, "final_dna_consolidation")
+            if save:
+                self.config.save_output(parsed, "final_dna.json", "dna")
+            logger.info("Final DNA consolidated successfully")
+            return self.carry_fallback(parsed, accumulated_dna)
         
         logger.error("Failed to consolidate final DNA after retries")
-        return accumulated_dna
+        return Fallback(accumulated_dna)
     
-    def process_story(self, text_or_path):
+    def build_global_dna(self, text_or_path):
+        manifest = self.load_chunk_manifest() if self.config.incremental else None
+        known_summaries = {}
+        if manifest:
+            known_summaries = {
+                entry["hash"]: entry["summary"]
+                for entry in manifest["chunks"]
+                if entry["summary"] is not None
+            }
+        
+        # CPU-only name/alias index: hints for the summarizer, deterministic character dedup for the merges.
+        self.entities = EntityIndex(self.config.entity_min_mentions) if self.config.entity_prepass else None
+        
         if text_or_path.endswith(".pdf"):
-            text = self.extract_text_from_pdf(text_or_path)
+            fingerprints = []
+            pages = self.iter_pdf_pages(text_or_path)
+            chunks = self.stream_chunks_to_disk(self.iter_chunks(self.iter_paragraphs(pages)), fingerprints)
         else:
-            text = text_or_path
+            chunks = self.chunk_text(text_or_path)
+            fingerprints = [self.fingerprint_chunk(chunk) for chunk in chunks]
+            if self.entities is not None:
+                with self.tracer.stage("entity_index"):
+                    self.entities.add_chunks(chunks)
         
-        chunks = self.chunk_text(text)
+        # Checkpoint the manifest as work completes so a crashed run resumes mid-stage.
+        interval = max(1, self.config.checkpoint_interval)
+        completed = {}
+        checkpoint_lock = threading.Lock()
         
-        logger.info("Generating local summaries")
-        local_summaries = []
-        for i, chunk in enumerate(chunks):
-            logger.info(f"Processing chunk {i+1}/{len(chunks)}")
-            summary = self.generate_local_summary(chunk)
-            local_summaries.append(summary)
+        def checkpoint_summary(i, summary):
+            with checkpoint_lock:
+                completed[i] = summary
+                if len(completed) % interval == 0:
+                    done_fingerprints = list(fingerprints)
+                    self.save_chunk_manifest(
+                        done_fingerprints,
+                        [completed.get(j) for j in range(len(done_fingerprints))],
+                        self.reusable_dna_states(done_fingerprints, manifest)
+                    )
         
+        with self.tracer.stage("local_summaries"):
+            local_summaries = self.generate_local_summaries(chunks, known_summaries, checkpoint_summary)
+        
+        if self.entities is not None:
+            self.config.save_output(self.entities.to_dict(), "entity_index.json", "dna")
+            local_summaries = [self.dedupe_characters(summary) for summary in local_summaries]
         self.config.save_output(local_summaries, "local_summaries.json", "dna")
         
-        logger.info("Building global DNA with rolling window")
-        global_dna = {
-            "characters": [],
-            "events": [],
-            "themes": []
-        }
+        previous_states = self.reusable_dna_states(fingerprints, manifest)
+        if manifest:
+            first_dirty = self.find_first_dirty(fingerprints, manifest)
+            logger.info(f"Incremental run: first changed chunk is {first_dirty+1}/{len(fingerprints)}")
         
-        for i, summary in enumerate(local_summaries):
-            logger.info(f"Updating DNA with chunk {i+1}/{len(local_summaries)}")
-            
-            if i == 0:
-                global_dna = summary
+        def checkpoint_merge(dna_states):
+            if len(dna_states) % interval == 0:
+                self.save_chunk_manifest(fingerprints, local_summaries, dna_states)
+        
+        with self.tracer.stage("dna_merge"):
+            if self.config.dna_merge_mode == "tree":
+                global_dna = self.build_global_dna_tree(local_summaries)
+                dna_states = []
             else:
-                global_dna = self.update_global_dna(global_dna, summary)
+                dna_states = self.build_global_dna_rolling(local_summaries, previous_states, checkpoint_merge)
+                global_dna = dna_states[-1] if dna_states else {
+                    "characters": [],
+                    "events": [],
+                    "themes": []
+                }
         
-        final_dna = self.consolidate_final_dna(global_dna)
+        self.save_chunk_manifest(fingerprints, local_summaries, dna_states)
+        return global_dna
+    
+    def process_story(self, text_or_path):
+        global_dna = self.build_global_dna(text_or_path)
+        with self.tracer.stage("dna_consolidation"):
+            final_dna = self.consolidate_final_dna(global_dna)
         return final_dna
\ No newline at end of file
@@ -0,0 +1,20 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from fake_llm import FakeChatModel
+from llm_client import set_llm_factory
+
+@pytest.fixture
+def config(tmp_path):
+    set_llm_factory(lambda config, temperature: FakeChatModel(latency=0, tokens_per_second=1e9))
+    config = Config()
+    config.cache_dir = str(tmp_path / "cache")
+    config.runs_dir = str(tmp_path / "runs")
+    config.manifests_dir = str(tmp_path / "manifests")
+    config.start_run()
+    yield config
+    set_llm_factory(None)
@@ -0,0 +1,108 @@
+from concurrent.futures import Future
+import story_processor
+from story_processor import StoryProcessor
+
+def sentences(count, prefix="Word"):
+    return " ".join(f"{prefix} number {i} walks to the market today." for i in range(count))
+
+def token_processor(config, budget=120, overlap=20):
+    config.chunking_mode = "tokens"
+    config.chunk_token_budget = budget
+    config.chunk_overlap_tokens = overlap
+    return StoryProcessor(config)
+
+def test_token_chunks_stay_within_budget(config):
+    processor = token_processor(config)
+    paragraphs = [sentences(3, f"P{i}") for i in range(12)]
+
+    chunks = list(processor.iter_token_chunks(paragraphs))
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert sum(processor.count_tokens(piece) for piece in chunk) <= config.chunk_token_budget
+
+def test_token_chunks_cover_every_paragraph_in_order(config):
+    processor = token_processor(config, overlap=0)
+    paragraphs = [sentences(2, f"P{i}") for i in range(10)]
+
+    chunks = list(processor.iter_token_chunks(paragraphs))
+
+    assert [piece for chunk in chunks for piece in chunk] == paragraphs
+
+def test_token_chunks_carry_overlap_from_previous_chunk(config):
+    processor = token_processor(config, overlap=20)
+    paragraphs = [sentences(3, f"P{i}") for i in range(8)]
+
+    chunks = list(processor.iter_token_chunks(paragraphs))
+
+    for previous, current in zip(chunks, chunks[1:]):
+        head = current[0]
+        assert head not in paragraphs
+        assert previous[-1].endswith(head)
+        assert processor.count_tokens(head) <= config.chunk_overlap_tokens
+
+def test_oversized_paragraph_is_split_on_sentences(config):
+    processor = token_processor(config, budget=60, overlap=0)
+    paragraph = sentences(20)
+
+    chunks = list(processor.iter_token_chunks(["", paragraph, "   "]))
+
+    assert len(chunks) > 1
+    assert " ".join(piece for chunk in chunks for piece in chunk) == paragraph
+    for chunk in chunks:
+        assert sum(processor.count_tokens(piece) for piece in chunk) <= config.chunk_token_budget
+
+def test_single_sentence_longer_than_budget_is_split_on_words(config):
+    processor = token_processor(config, budget=30, overlap=0)
+    paragraph = " ".join(f"word{i}" for i in range(200)) + "."
+
+    pieces = processor.split_oversized_paragraph(paragraph, 30)
+
+    assert len(pieces) > 1
+    assert " ".join(text for text, _ in pieces) == paragraph
+    assert all(processor.count_tokens(text) == tokens <= 30 for text, tokens in pieces)
+
+def test_empty_input_yields_no_chunks(config):
+    processor = token_processor(config)
+
+    assert list(processor.iter_token_chunks(["", "  \n"])) == []
+
+class InlineExecutor:
+    # Runs batches on submit and records how many pages were submitted but not yet consumed.
+    def __init__(self, **kwargs):
+        self.pages_in_flight = 0
+        self.peak = 0
+        InlineExecutor.last = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, start, end):
+        future = Future()
+        future.set_result(fn(start, end))
+        self.pages_in_flight += end - start
+        self.peak = max(self.peak, self.pages_in_flight)
+        return future
+
+def test_parallel_pdf_extraction_caps_pages_in_flight(config, monkeypatch):
+    processor = StoryProcessor(config)
+
+    def extract(start, end):
+        return [f"page {i}" for i in range(start, end)]
+
+    def consume(pages):
+        for page in pages:
+            InlineExecutor.last.pages_in_flight -= 1
+            yield page
+
+    monkeypatch.setattr(story_processor, "ProcessPoolExecutor", InlineExecutor)
+    monkeypatch.setattr(story_processor, "extract_page_range", extract)
+    config.pdf_max_pages_in_flight = 24
+
+    pages = list(consume(processor.iter_pdf_pages_parallel("book.pdf", 500, 4)))
+
+    assert pages == [f"page {i}" for i in range(500)]
+    assert InlineExecutor.last.peak <= 24
@@ -0,0 +1,140 @@
+import fake_llm
+from entity_index import EntityIndex, name_key, name_tokens
+from story_processor import StoryProcessor
+
+CHUNKS = [
+    [
+        "Della Young counted the money again. One dollar and eighty-seven cents was all Della had.",
+        "Suddenly she whirled from the window. Mrs. Young stood before the glass, and Della Young smiled.",
+        "Then Mrs. Young put on her old brown jacket. Della ran down the stairs."
+    ],
+    [
+        "Jim Young was never late. Jim stopped inside the door, and Della went to Jim.",
+        "Suddenly the watch chain seemed foolish. Mr. Young laughed, and Jim Young sat down.",
+        "Then Mr. Young took the combs from his coat."
+    ],
+    [
+        "Madame Sofronie weighed the hair. Della took the twenty dollars from Madame Sofronie."
+    ]
+]
+
+def build_index(chunks=CHUNKS, **kwargs):
+    index = EntityIndex(**kwargs)
+    index.add_chunks(chunks)
+    return index
+
+def test_name_keys_ignore_case_titles_and_possessives():
+    assert name_key("Della's") == "della"
+    assert name_key("Mrs.  Young") == "mrs young"
+    assert name_tokens("Mrs. Young") == ("young",)
+
+def test_aliases_collapse_into_the_full_name():
+    index = build_index()
+
+    assert index.aliases["della"] == "della young"
+    assert index.aliases["jim"] == "jim young"
+    assert index.canonical("Della") == "Della Young"
+
+def test_titles_break_ties_by_gender():
+    index = build_index([[
+        "Mrs. Della Young arrived. Mr. Jim Young waited for Mrs. Della Young, and Mr. Jim Young smiled.",
+        "Then Mrs. Young sat down while Mr. Young stood. Later Mrs. Young laughed at Mr. Young."
+    ]])
+
+    assert index.aliases["mrs young"] == "mrs della young"
+    assert index.aliases["mr young"] == "mr jim young"
+
+def test_ambiguous_aliases_stay_separate():
+    index = build_index()
+
+    assert index.aliases["mrs young"] == "mrs young"
+    assert index.canonical("Mrs. Young") == "Mrs. Young"
+    assert index.group_of("Young") is None
+
+def test_words_that_only_open_sentences_are_not_names():
+    index = build_index()
+
+    assert not index.is_name("suddenly")
+    assert "suddenly" not in index.aliases
+
+def test_names_below_the_mention_threshold_are_ignored():
+    index = build_index(min_mentions=3)
+
+    assert "madame sofronie" not in index.aliases
+    assert index.canonical("Madame Sofronie") == "Madame Sofronie"
+
+def test_unseen_names_join_the_group_sharing_the_most_tokens():
+    index = build_index()
+
+    assert index.group_of("Della Dillingham Young") == "della young"
+    assert index.group_of("Someone Else") is None
+
+def test_dedupe_merges_aliases_and_fills_missing_fields():
+    index = build_index()
+
+    characters = index.dedupe_characters([
+        {"name": "Della", "role": "wife", "trait": ""},
+        {"name": "Della Young", "role": "", "trait": "devoted"},
+        {"name": "Jim", "role": "husband"},
+        "not a character",
+        {"name": "Stranger", "role": "passer-by"}
+    ])
+
+    assert characters == [
+        {"name": "Della Young", "role": "wife", "trait": "devoted"},
+        {"name": "Jim Young", "role": "husband"},
+        "not a character",
+        {"name": "Stranger", "role": "passer-by"}
+    ]
+
+def test_new_characters_skips_aliases_of_known_ones():
+    index = build_index()
+    known = [{"name": "Della Young"}]
+
+    assert index.new_characters(known, [{"name": "Della"}, {"name": "Jim"}]) == [{"name": "Jim"}]
+
+def test_chunk_hint_lists_only_names_used_in_that_chunk():
+    index = build_index()
+
+    hint = index.chunk_hint(0)
+
+    assert hint == "- Della Young (also: Della)\n- Mrs. Young"
+    assert index.chunk_hint(99) == "- none detected"
+
+def test_chunk_hint_ignores_edits_elsewhere_that_keep_the_same_names():
+    edited = CHUNKS[:2] + [["Madame Sofronie lifted the hair and named her price. Della paid Madame Sofronie nothing back."]]
+
+    original = build_index()
+    changed = build_index(edited)
+
+    assert changed.chunk_hint(0) == original.chunk_hint(0)
+    assert changed.chunk_hint(1) == original.chunk_hint(1)
+
+def test_adding_a_chunk_twice_does_not_double_count():
+    index = build_index()
+    mentions = dict(index.mentions)
+
+    index.add_chunk(0, ["Della Young. Della Young. Della Young."])
+
+    assert dict(index.mentions) == mentions
+
+def test_scan_keeps_titles_after_sentence_openers():
+    found, mid_sentence = EntityIndex().scan("Then Mrs. Young sat. Later Mr. Young stood, and Della laughed.")
+
+    assert found == {"Mrs. Young": 1, "Mr. Young": 1, "Della": 1}
+    assert mid_sentence == {"mrs young", "mr young", "della"}
+
+def test_summary_cache_does_not_depend_on_the_hint(config, monkeypatch):
+    calls = []
+    original_reply = fake_llm.fake_reply
+    monkeypatch.setattr(fake_llm, "fake_reply", lambda system, user: calls.append(user) or original_reply(system, user))
+    processor = StoryProcessor(config)
+    # Dropping "Della" from another chunk can push her below min_mentions and empty this hint.
+    without_della = build_index([CHUNKS[1], [paragraph.replace("Della", "She") for paragraph in CHUNKS[0]], CHUNKS[2]])
+    assert without_della.chunk_hint(0) != build_index().chunk_hint(1)
+
+    first = processor.generate_local_summary(CHUNKS[1], build_index().chunk_hint(1))
+    second = processor.generate_local_summary(CHUNKS[1], without_della.chunk_hint(0))
+
+    assert second == first
+    assert len(calls) == 1
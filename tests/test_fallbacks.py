@@ -0,0 +1,63 @@
+import pytest
+import fake_llm
+from story_processor import StoryProcessor
+from utils import Fallback, is_fallback
+
+SUMMARY = {
+    "characters": [{"name": "Della", "role": "wife", "trait": "devoted"}],
+    "events": ["Della counts her savings."],
+    "themes": ["sacrifice"]
+}
+LATER = {
+    "characters": [{"name": "Jim", "role": "husband", "trait": "proud"}],
+    "events": ["Jim sells his watch."],
+    "themes": ["love"]
+}
+
+MERGES = [
+    lambda processor, dna, summary: processor.update_global_dna(dna, summary),
+    lambda processor, dna, summary: processor.merge_dna_pair(dna, summary)
+]
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+    original_reply = fake_llm.fake_reply
+
+    def reply(system, user):
+        calls.append(system)
+        return original_reply(system, user)
+
+    monkeypatch.setattr(fake_llm, "fake_reply", reply)
+    return calls
+
+@pytest.mark.parametrize("merge", MERGES)
+def test_merges_of_fallback_inputs_stay_degraded_and_are_not_cached(config, llm_calls, merge):
+    processor = StoryProcessor(config)
+
+    first = merge(processor, SUMMARY, Fallback(LATER))
+    second = merge(processor, SUMMARY, Fallback(LATER))
+
+    assert is_fallback(first) and is_fallback(second)
+    assert len(llm_calls) == 2
+
+@pytest.mark.parametrize("merge", MERGES)
+def test_cache_hits_carry_the_fallback_marker(config, llm_calls, merge):
+    processor = StoryProcessor(config)
+
+    healthy = merge(processor, SUMMARY, LATER)
+    degraded = merge(processor, SUMMARY, Fallback(LATER))
+
+    assert not is_fallback(healthy)
+    assert is_fallback(degraded)
+    assert degraded == healthy
+    assert len(llm_calls) == 1
+
+def test_consolidating_a_fallback_marks_the_final_dna(config, llm_calls):
+    processor = StoryProcessor(config)
+
+    final_dna = processor.consolidate_final_dna(Fallback(SUMMARY), save=False)
+
+    assert is_fallback(final_dna)
+    assert processor.consolidate_final_dna(SUMMARY, save=False) == final_dna
+    assert len(llm_calls) == 2
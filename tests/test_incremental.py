@@ -0,0 +1,44 @@
+from story_processor import StoryProcessor
+from workspace import document_key
+
+STORY = "\n\n".join(
+    f"Chapter {i}. Della counted the coins again and again by the window number {i}." for i in range(12)
+)
+
+def chunked_processor(config):
+    config.chunking_mode = "tokens"
+    config.chunk_token_budget = 60
+    config.chunk_overlap_tokens = 0
+    return StoryProcessor(config)
+
+def edited_rerun(config, story):
+    processor = chunked_processor(config)
+    processor.build_global_dna(story)
+    # Every UI submission starts a fresh run workspace.
+    config.start_run()
+    edited = story.replace("number 10.", "numbr 10.")
+    assert edited != story
+    rerun = chunked_processor(config)
+    fingerprints = [rerun.fingerprint_chunk(chunk) for chunk in rerun.chunk_text(edited)]
+    return rerun, fingerprints
+
+def test_document_keys_name_uploads_and_pastes():
+    assert document_key("/tmp/uploads/gift.pdf", "ignored") == "file:gift.pdf"
+    assert document_key(None, "\n\n  The Gift of the Magi  \nOne dollar.") == "text:The Gift of the Magi"
+    assert document_key(None, "   ") is None
+
+def test_edited_document_reuses_the_manifest_of_an_earlier_run(config):
+    config.document_key = document_key("gift.txt")
+
+    rerun, fingerprints = edited_rerun(config, STORY)
+    manifest = rerun.load_chunk_manifest()
+
+    assert manifest is not None
+    first_dirty = rerun.find_first_dirty(fingerprints, manifest)
+    assert 0 < first_dirty < len(fingerprints)
+    assert len(rerun.reusable_dna_states(fingerprints, manifest)) == first_dirty
+
+def test_unnamed_documents_keep_their_manifest_in_the_run(config):
+    rerun, _ = edited_rerun(config, STORY)
+
+    assert rerun.load_chunk_manifest() is None
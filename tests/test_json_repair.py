@@ -0,0 +1,34 @@
+import pytest
+from utils import parse_json_response, repair_json
+
+def test_plain_json_is_parsed_as_is():
+    assert parse_json_response('{"a": [1, 2], "b": "x"}') == {"a": [1, 2], "b": "x"}
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1, "b": [1, 2,],}', {"a": 1, "b": [1, 2]}),
+    ('[1, 2, 3 , ]', [1, 2, 3]),
+    ('{"a": {"b": 1,\n  }\n}', {"a": {"b": 1}})
+])
+def test_trailing_commas_are_dropped(text, expected):
+    assert repair_json(text) == expected
+
+def test_surrounding_prose_and_fences_are_ignored():
+    text = 'Here is the JSON:\n```json\n{"themes": ["love"]}\n```\nHope this helps!'
+
+    assert parse_json_response(text) == {"themes": ["love"]}
+
+def test_truncated_string_and_brackets_are_closed():
+    assert repair_json('{"themes": ["love", "sacri') == {"themes": ["love", "sacri"]}
+
+def test_truncation_after_a_key_cuts_back_to_last_complete_element():
+    assert repair_json('{"themes": ["love"], "plot_arc": ') == {"themes": ["love"]}
+
+def test_brackets_inside_strings_are_not_structure():
+    assert repair_json('{"text": "a } or ] and \\"quoted\\"", "n": 1') == {"text": 'a } or ] and "quoted"', "n": 1}
+
+def test_text_after_the_first_complete_value_is_ignored():
+    assert repair_json('{"a": 1} {"b": 2}') == {"a": 1}
+
+@pytest.mark.parametrize("text", ["", "no json here", '{"a" "b"}', '{"a": tru'])
+def test_unrecoverable_input_returns_none(text):
+    assert parse_json_response(text) is None
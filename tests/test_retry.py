@@ -0,0 +1,94 @@
+import httpx
+import openai
+import pytest
+import fake_llm
+from langchain_core.messages import AIMessageChunk, HumanMessage, SystemMessage
+from llm_client import get_llm
+from retry import LLMCallAborted, ParseError, call_with_retry, classify_error, json_parser, stream_with_retry
+
+MESSAGES = [SystemMessage(content="Polish the story."), HumanMessage(content="Scenes.")]
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://fake-llm.local/v1/chat/completions"))
+
+class ScriptedLLM:
+    # Each attempt streams its tokens, then raises its error (if any).
+    def __init__(self, *attempts):
+        self.attempts = list(attempts)
+        self.calls = 0
+
+    def stream(self, messages):
+        tokens, error = self.attempts[self.calls]
+        self.calls += 1
+        for token in tokens:
+            yield AIMessageChunk(content=token)
+        if error is not None:
+            raise error
+        yield AIMessageChunk(content="", usage_metadata={"input_tokens": 5, "output_tokens": len(tokens), "total_tokens": 5 + len(tokens)})
+
+@pytest.fixture
+def fast_retries(config):
+    config.retry_base_delay = 0
+    return config
+
+def test_stream_retries_transient_errors_before_the_first_token(fast_retries):
+    llm = ScriptedLLM(([], connection_error()), (["Once ", "upon."], None))
+
+    assert "".join(stream_with_retry(fast_retries, llm, "Polishing", MESSAGES)) == "Once upon."
+    assert llm.calls == 2
+    call = fast_retries.get_tracer().calls[-1]
+    assert (call["attempts"], call["outcome"], call["completion_tokens"]) == (2, "success", 2)
+
+def test_stream_does_not_retry_after_text_was_yielded(fast_retries):
+    llm = ScriptedLLM((["Once "], connection_error()), (["Once ", "upon."], None))
+    received = []
+
+    with pytest.raises(LLMCallAborted):
+        for token in stream_with_retry(fast_retries, llm, "Polishing", MESSAGES):
+            received.append(token)
+
+    assert received == ["Once "]
+    assert llm.calls == 1
+
+def test_stream_gives_up_after_max_attempts(fast_retries):
+    llm = ScriptedLLM(*[([], connection_error())] * fast_retries.retry_max_attempts)
+
+    with pytest.raises(LLMCallAborted):
+        list(stream_with_retry(fast_retries, llm, "Polishing", MESSAGES))
+
+    assert llm.calls == fast_retries.retry_max_attempts
+    assert fast_retries.get_tracer().calls[-1]["outcome"] == "exhausted"
+
+@pytest.mark.parametrize("content", ['["scene_text", "scene_summary"]', '"just a string"', "42"])
+def test_json_parser_rejects_json_that_is_not_an_object(content):
+    parse = json_parser(lambda scene: bool(scene.get("scene_text")), "scene")
+
+    with pytest.raises(ParseError) as raised:
+        parse(content)
+
+    assert classify_error(raised.value) == "parse"
+    assert raised.value.parsed is None
+
+def test_non_object_replies_are_re_prompted(config, monkeypatch):
+    replies = [["not", "an", "object"], {"scene_text": "Snow fell.", "scene_summary": "It snowed."}]
+    prompts = []
+
+    def reply(system, user):
+        prompts.append(user)
+        return replies[len(prompts) - 1]
+
+    monkeypatch.setattr(fake_llm, "fake_reply", reply)
+    # A transient classification would back off for up to a minute; a parse error re-prompts at once.
+    config.retry_base_delay = 60
+
+    result = call_with_retry(
+        config,
+        get_llm(config),
+        "Generating scene",
+        MESSAGES,
+        json_parser(lambda scene: bool(scene.get("scene_text")), "scene"),
+        schema="scene"
+    )
+
+    assert result["scene_text"] == "Snow fell."
+    assert len(prompts) == 2
@@ -0,0 +1,224 @@
+import json
+import os
+import pytest
+import fake_llm
+from langchain_core.messages import SystemMessage, HumanMessage
+from llm_client import get_llm
+from retry import call_with_retry, json_parser
+from schemas import SchemaError, apply_fixes, join_path, join_path_tokens, response_format, schema_at, schema_errors, split_path
+from utils import validate_final_dna, validate_story_dna, validate_transformation_map
+
+OUTPUTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "outputs", "dna")
+
+STORY_DNA = {
+    "characters": [{"name": "Della", "role": "wife", "trait": "devoted"}],
+    "events": ["Della sells her hair."],
+    "themes": ["sacrifice"]
+}
+
+def errors_of(value, schema="story_dna"):
+    return {error.path: error.problem for error in schema_errors(schema, value)}
+
+@pytest.mark.parametrize("path, tokens", [
+    ("plot_arc", ["plot_arc"]),
+    ("plot_arc.setup", ["plot_arc", "setup"]),
+    ("characters[0].trait", ["characters", 0, "trait"]),
+    ("character_mappings[\"Della Young\"]", ["character_mappings", "Della Young"]),
+    ("character_mappings[\"Mrs. \\\"D\\\" [Young]\"]", ["character_mappings", 'Mrs. "D" [Young]']),
+    ("[2][10]", [2, 10])
+])
+def test_paths_round_trip(path, tokens):
+    assert split_path(path) == tokens
+    assert join_path_tokens(tokens) == path
+
+def test_join_path_quotes_keys_that_are_not_identifiers():
+    assert join_path("", "themes") == "themes"
+    assert join_path("mappings", "Jim Dillingham") == 'mappings["Jim Dillingham"]'
+    assert join_path("mappings", "2nd") == 'mappings["2nd"]'
+    assert join_path("", 3) == "[3]"
+
+def test_valid_document_has_no_errors():
+    assert schema_errors("story_dna", STORY_DNA) == []
+
+def test_errors_point_at_the_offending_field():
+    value = {
+        "characters": [{"name": "Della", "role": "wife", "trait": "devoted"}, {"name": "Jim", "role": 3}],
+        "events": [],
+        "themes": "sacrifice"
+    }
+
+    assert errors_of(value) == {
+        "characters[1].trait": "missing",
+        "characters[1].role": "must be a string",
+        "events": "must not be empty",
+        "themes": "must be an array"
+    }
+
+def test_root_type_error_has_empty_path():
+    errors = schema_errors("story_dna", ["not", "an", "object"])
+
+    assert errors == [SchemaError("", "must be an object")]
+    assert str(errors[0]) == "response must be an object"
+
+def test_free_form_mapping_keys_are_validated_with_quoted_paths():
+    mappings = {
+        "character_mappings": {"Della Young": 7},
+        "conflict_mappings": {},
+        "preserved_dynamics": []
+    }
+
+    errors = errors_of(mappings, "transformation_mappings")
+
+    assert errors['character_mappings["Della Young"]'] == "must be a string or an object"
+    assert errors["conflict_mappings"] == "must not be empty"
+
+def test_union_fields_report_errors_from_the_matching_branch():
+    mappings = {
+        "character_mappings": [{"original_name": "Della", "new_name": 3}],
+        "conflict_mappings": "lack of money",
+        "preserved_dynamics": []
+    }
+
+    assert errors_of(mappings, "transformation_mappings") == {
+        "character_mappings[0].new_name": "must be a string",
+        "conflict_mappings": "must be an array or an object"
+    }
+
+def test_schema_at_follows_items_and_additional_properties():
+    assert schema_at("story_dna", "characters[4].trait") == {"type": "string"}
+    assert schema_at("story_dna", "characters")["type"] == "array"
+    assert schema_at("transformation_mappings", "character_mappings[0].new_role") == {"type": "string"}
+    assert "anyOf" in schema_at("transformation_mappings", 'character_mappings["Anyone"]')
+    assert schema_at("story_dna", "unknown.field") == {}
+
+def load_output(filename):
+    with open(os.path.join(OUTPUTS, filename), "r") as f:
+        return json.load(f)
+
+def test_committed_model_outputs_pass_validation():
+    transformation_map = load_output("transformation_map.json")
+
+    assert validate_final_dna(load_output("final_dna.json"))
+    assert validate_transformation_map(transformation_map)
+    assert schema_errors("world_definition", transformation_map["new_world"]) == []
+    assert all(validate_story_dna(summary) for summary in load_output("local_summaries.json"))
+
+def test_final_dna_accepts_either_trait_field_and_list_dynamics():
+    dna = load_output("final_dna.json")
+    dna["characters"][0]["trait"] = dna["characters"][0].pop("core_trait")
+    dna["character_dynamics"] = "One sentence instead of a list."
+
+    assert schema_errors("final_dna", dna) == []
+
+def test_fixes_replace_only_fields_named_in_errors():
+    value = {"characters": [{"name": "Della", "role": "wife"}], "events": [], "themes": ["love"]}
+    errors = schema_errors("story_dna", value)
+
+    repaired, applied = apply_fixes(value, {
+        "characters[0].trait": "devoted",
+        "events": ["Della sells her hair."],
+        "themes": ["rewritten"],
+        "characters[0].name": "Someone else"
+    }, errors)
+
+    assert applied == 2
+    assert repaired == {
+        "characters": [{"name": "Della", "role": "wife", "trait": "devoted"}],
+        "events": ["Della sells her hair."],
+        "themes": ["love"]
+    }
+    assert "trait" not in value["characters"][0]
+
+def test_fixes_may_target_fields_nested_under_an_error():
+    value = {"characters": [], "events": ["e"], "themes": ["t"]}
+
+    repaired, applied = apply_fixes(value, {
+        "characters[0]": {"name": "Jim", "role": "husband", "trait": "proud"}
+    }, schema_errors("story_dna", value))
+
+    assert applied == 1
+    assert repaired["characters"] == [{"name": "Jim", "role": "husband", "trait": "proud"}]
+
+def test_fixes_ignore_paths_that_only_share_a_prefix():
+    value = {"plot_arc": {"setup": "s", "conflict": "c", "climax": "x", "resolution": "r"}, "plot_arcs": "keep"}
+    errors = [SchemaError("plot_arc.setup", "must be a string")]
+
+    repaired, applied = apply_fixes(value, {
+        "plot_arc.setupX": "wrong",
+        "plot_arcs": "wrong",
+        "plot_arc.setup": "fixed"
+    }, errors)
+
+    assert applied == 1
+    assert repaired == {"plot_arc": {"setup": "fixed", "conflict": "c", "climax": "x", "resolution": "r"}, "plot_arcs": "keep"}
+
+def test_fixes_with_malformed_or_unreachable_paths_are_skipped():
+    value = {"events": ["a"], "conflict_mappings": {}, "themes": "love"}
+    errors = [SchemaError("events", "bad"), SchemaError("conflict_mappings", "must not be empty"), SchemaError("themes", "must be an array")]
+
+    repaired, applied = apply_fixes(value, {
+        "events..x": "wrong",
+        "events[5]": "too far",
+        "events.name": "not a list key",
+        "conflict_mappings[0]": "not an object key",
+        "themes[0]": "inside a string",
+        "": "root"
+    }, errors)
+
+    assert applied == 0
+    assert repaired == value
+
+def test_root_errors_allow_no_fixes():
+    value = ["not", "an", "object"]
+
+    repaired, applied = apply_fixes(value, {"characters": []}, schema_errors("story_dna", value))
+
+    assert applied == 0
+    assert repaired == value
+
+def test_invalid_fields_are_repaired_with_a_targeted_follow_up(config, monkeypatch):
+    prompts = []
+    original_reply = fake_llm.fake_reply
+    broken = {"characters": [{"name": "Della", "role": "wife"}], "events": ["Della sells her hair."], "themes": ["sacrifice"]}
+
+    def reply(system, user):
+        prompts.append(system)
+        if "JSON field fixer" in system:
+            assert "characters[0].trait missing" in user
+            return original_reply(system, user)
+        return broken
+
+    monkeypatch.setattr(fake_llm, "fake_reply", reply)
+    messages = [SystemMessage(content="You extract story DNA."), HumanMessage(content="Della sells her hair.")]
+
+    result = call_with_retry(
+        config,
+        get_llm(config),
+        "Extracting DNA",
+        messages,
+        json_parser(validate_story_dna, "story DNA"),
+        schema="story_dna"
+    )
+
+    assert len(prompts) == 2 and "JSON field fixer" in prompts[1]
+    assert result["characters"][0]["name"] == "Della"
+    assert result["characters"][0]["trait"]
+    assert result["events"] == broken["events"]
+    assert schema_errors("story_dna", result) == []
+
+@pytest.mark.parametrize("schema_name, build", [
+    ("final_dna", lambda: load_output("final_dna.json")),
+    ("world_definition", lambda: load_output("transformation_map.json")["new_world"]),
+    ("transformation_mappings", lambda: load_output("transformation_map.json")["mappings"]),
+    ("short_story_analysis", lambda: {
+        "story_dna": load_output("final_dna.json"),
+        "new_world": load_output("transformation_map.json")["new_world"],
+        "mappings": load_output("transformation_map.json")["mappings"]
+    })
+])
+def test_response_format_describes_the_committed_outputs(schema_name, build):
+    jsonschema = pytest.importorskip("jsonschema")
+    schema = response_format(schema_name)["json_schema"]["schema"]
+
+    jsonschema.validate(build(), schema)
+    assert schema_errors(schema_name, build()) == []
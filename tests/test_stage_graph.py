@@ -0,0 +1,87 @@
+import threading
+import pytest
+from pipeline import StageGraph
+from utils import Fallback
+
+def checkpointed_graph(config, signature="run"):
+    checkpoints = config.get_checkpoints()
+    checkpoints.begin(signature)
+    return StageGraph(max_workers=4, checkpoints=checkpoints)
+
+def test_stages_run_after_their_dependencies():
+    graph = StageGraph(max_workers=4)
+    order = []
+    lock = threading.Lock()
+
+    def stage(name, value):
+        def run(*inputs):
+            with lock:
+                order.append(name)
+            return value + sum(inputs)
+        return run
+
+    graph.add_stage("total", stage("total", 0), ["left", "right"])
+    graph.add_stage("left", stage("left", 1), ["root"])
+    graph.add_stage("right", stage("right", 2), ["root"])
+    graph.add_stage("root", stage("root", 10))
+
+    results = graph.run()
+
+    assert results == {"root": 10, "left": 11, "right": 12, "total": 23}
+    assert order[0] == "root" and order[-1] == "total"
+
+def test_completion_callback_sees_every_stage():
+    graph = StageGraph()
+    graph.add_stage("a", lambda: 1)
+    graph.add_stage("b", lambda a: a + 1, ["a"])
+    seen = []
+
+    graph.run(lambda name, result: seen.append((name, result)))
+
+    assert seen == [("a", 1), ("b", 2)]
+
+def test_unsatisfiable_dependency_raises():
+    graph = StageGraph()
+    graph.add_stage("a", lambda: 1)
+    graph.add_stage("b", lambda missing: missing, ["missing"])
+
+    with pytest.raises(ValueError, match="b"):
+        graph.run()
+
+def test_checkpointed_stages_are_restored_instead_of_rerun(config):
+    calls = []
+    graph = checkpointed_graph(config)
+    graph.add_stage("a", lambda: calls.append("a") or {"value": 1})
+    graph.add_stage("b", lambda a: calls.append("b") or a["value"] + 1, ["a"])
+    graph.run()
+
+    resumed = checkpointed_graph(config)
+    resumed.add_stage("a", lambda: calls.append("a") or {"value": 1})
+    resumed.add_stage("b", lambda a: calls.append("b") or a["value"] + 1, ["a"])
+
+    assert resumed.run() == {"a": {"value": 1}, "b": 2}
+    assert calls == ["a", "b"]
+
+def test_changed_signature_discards_checkpoints(config):
+    calls = []
+    for signature in ("first", "second"):
+        graph = checkpointed_graph(config, signature)
+        graph.add_stage("a", lambda: calls.append("a") or 1)
+        graph.run()
+
+    assert calls == ["a", "a"]
+
+def test_fallback_results_and_their_dependents_are_not_checkpointed(config):
+    graph = checkpointed_graph(config)
+    graph.add_stage("clean", lambda: {"ok": True})
+    graph.add_stage("degraded", lambda: Fallback({"ok": False}))
+    graph.add_stage("derived", lambda degraded: {"from": degraded["ok"]}, ["degraded"])
+
+    results = graph.run()
+
+    assert results["derived"] == {"from": False}
+    assert graph.degraded == {"degraded", "derived"}
+    checkpoints = config.get_checkpoints()
+    assert checkpoints.has("clean")
+    assert not checkpoints.has("degraded")
+    assert not checkpoints.has("derived")
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class Tracer:
+    def __init__(self, run_id=None):
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.started = time.time()
+        self.stages = []
+        self.calls = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            duration = time.time() - start
+            with self._lock:
+                self.stages.append({
+                    "name": name,
+                    "start": round(start - self.started, 3),
+                    "duration": round(duration, 3)
+                })
+            logger.info(f"Stage {name} took {duration:.2f}s")
+
+    def record_call(self, label, duration, prompt_tokens=0, completion_tokens=0, attempts=1, outcome="success"):
+        with self._lock:
+            self.calls.append({
+                "label": label,
+                "start": round(time.time() - duration - self.started, 3),
+                "duration": round(duration, 3),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "attempts": attempts,
+                "outcome": outcome
+            })
+
+    def summary(self, cache_stats=None):
+        with self._lock:
+            calls = list(self.calls)
+            stages = list(self.stages)
+
+        by_label = defaultdict(lambda: {
+            "calls": 0,
+            "retries": 0,
+            "wall_time": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0
+        })
+        for call in calls:
+            entry = by_label[call["label"]]
+            entry["calls"] += 1
+            entry["retries"] += max(0, call["attempts"] - 1)
+            entry["wall_time"] = round(entry["wall_time"] + call["duration"], 3)
+            entry["prompt_tokens"] += call["prompt_tokens"]
+            entry["completion_tokens"] += call["completion_tokens"]
+
+        by_stage = defaultdict(float)
+        for stage in stages:
+            by_stage[stage["name"]] = round(by_stage[stage["name"]] + stage["duration"], 3)
+
+        return {
+            "run_id": self.run_id,
+            "total_time": round(time.time() - self.started, 3),
+            "llm_calls": len(calls),
+            "retries": sum(max(0, call["attempts"] - 1) for call in calls),
+            "prompt_tokens": sum(call["prompt_tokens"] for call in calls),
+            "completion_tokens": sum(call["completion_tokens"] for call in calls),
+            "stages": dict(by_stage),
+            "calls_by_label": dict(by_label),
+            "cache": cache_stats or {}
+        }
+
+    def save(self, config):
+        summary = self.summary(config.get_cache().stats())
+        summary["context"] = config.get_context_builder().stats()
+        with self._lock:
+            trace = {
+                "run_id": self.run_id,
+                "summary": summary,
+                "stages": list(self.stages),
+                "calls": list(self.calls)
+            }
+        filepath = config.save_output(trace, f"trace_{self.run_id}.json", "traces")
+        logger.info(f"Trace saved to {filepath}")
+        return filepath
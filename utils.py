@@ -1,104 +1,145 @@
 import json
 import re
 import logging
+import threading
+import tiktoken
+from schemas import schema_errors
 
 logger = logging.getLogger(__name__)
 
-def extract_json_from_response(response_text):
-    logger.info("Extracting JSON from LLM response")
-    
-    text = response_text.strip()
-    
-    json_match = re.search(r'```json\s*(.*?)\s*```', text, re.DOTALL)
-    if json_match:
-        text = json_match.group(1).strip()
-        logger.info("Stripped markdown code blocks from response")
-    
-    code_match = re.search(r'```\s*(.*?)\s*```', text, re.DOTALL)
-    if code_match:
-        text = code_match.group(1).strip()
-        logger.info("Stripped generic code blocks from response")
-    
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+def get_encoding(model_name):
+    with _encodings_lock:
+        if model_name not in _encodings:
+            try:
+                try:
+                    _encodings[model_name] = tiktoken.encoding_for_model(model_name)
+                except KeyError:
+                    _encodings[model_name] = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logger.warning(f"Tokenizer unavailable for {model_name}, approximating token counts: {e}")
+                _encodings[model_name] = None
+        return _encodings[model_name]
+
+def count_tokens(text, model_name):
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|(?<=[.!?]["\'”’)])\s+')
+
+def split_sentences(text):
+    return [s for s in SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+
+class Fallback(dict):
+    # A stand-in for an LLM result that failed. It serializes like any dict, but callers must
+    # never persist it for reuse (cache, chunk manifest, checkpoints) so a later run retries it.
+    pass
+
+def is_fallback(value):
+    if isinstance(value, Fallback):
+        return True
+    if isinstance(value, dict):
+        return any(is_fallback(item) for item in value.values())
+    if isinstance(value, list):
+        return any(is_fallback(item) for item in value)
+    return False
+
+def try_json_loads(text):
     try:
-        parsed = json.loads(text)
-        logger.info("Successfully parsed JSON response")
-        return parsed
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parsing failed: {e}")
-        logger.error(f"Attempted to parse: {text[:200]}...")
+        return json.loads(text)
+    except json.JSONDecodeError:
         return None
 
-def validate_story_dna(dna):
-    logger.info("Validating story DNA structure")
-    
-    if not dna:
-        logger.error("DNA is None or empty")
-        return False
+def repair_json(text):
+    # Salvage truncated or slightly malformed JSON: drop trailing commas, close open strings
+    # and brackets, and as a last resort cut back to the last complete element.
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return None
     
-    required_keys = ["characters", "events", "themes"]
-    for key in required_keys:
-        if key not in dna or not dna[key]:
-            logger.error(f"DNA missing or empty key: {key}")
-            return False
+    out = []
+    stack = []
+    cuts = []
+    in_string = False
+    escape = False
+    
+    for ch in text[min(starts):]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        
+        if ch in "}]":
+            if not stack or stack[-1] != ch:
+                break
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return try_json_loads("".join(out))
+            cuts.append((len(out), "".join(reversed(stack))))
+            continue
+        
+        if ch == ",":
+            cuts.append((len(out), "".join(reversed(stack))))
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        out.append(ch)
+    
+    body = "".join(out)
+    candidates = [body + ('"' if in_string else "") + "".join(reversed(stack))]
+    candidates.extend(body[:length] + closers for length, closers in reversed(cuts[-50:]))
+    
+    for candidate in candidates:
+        parsed = try_json_loads(candidate)
+        if parsed is not None:
+            return parsed
+    return None
+
+def parse_json_response(response_text):
+    # Structured-output responses are plain JSON; only fall back to repair when they are not.
+    parsed = try_json_loads(response_text)
+    if parsed is not None:
+        return parsed
     
-    if not isinstance(dna["characters"], list) or len(dna["characters"]) == 0:
-        logger.error("DNA has no characters")
-        return False
+    parsed = repair_json(response_text)
+    if parsed is not None:
+        logger.info("Recovered JSON from a non-JSON or malformed response")
+    return parsed
+
+def check_schema(schema_name, value, description):
+    logger.info(f"Validating {description}")
     
-    if not isinstance(dna["events"], list) or len(dna["events"]) == 0:
-        logger.error("DNA has no events")
+    errors = schema_errors(schema_name, value)
+    if errors:
+        logger.error(f"{description} is invalid: {'; '.join(map(str, errors))}")
         return False
     
-    logger.info("DNA validation passed")
+    logger.info(f"{description} validation passed")
     return True
 
+def validate_story_dna(dna):
+    return check_schema("story_dna", dna, "Story DNA")
+
 def validate_transformation_map(transform_map):
-    logger.info("Validating transformation map")
-    
     if not transform_map or "mappings" not in transform_map:
         logger.error("Transformation map is invalid or missing mappings")
         return False
-    
-    mappings = transform_map["mappings"]
-    
-    if not mappings.get("character_mappings"):
-        logger.error("No character mappings found")
-        return False
-    
-    if not mappings.get("conflict_mappings"):
-        logger.error("No conflict mappings found")
-        return False
-    
-    logger.info("Transformation map validation passed")
-    return True
+    return check_schema("transformation_mappings", transform_map["mappings"], "Transformation map")
 
 def validate_final_dna(dna):
-    logger.info("Validating final story DNA")
-    
-    if not dna:
-        logger.error("Final DNA is None or empty")
-        return False
-    
-    required_keys = ["plot_arc", "characters", "themes", "critical_moments"]
-    for key in required_keys:
-        if key not in dna:
-            logger.error(f"Final DNA missing key: {key}")
-            return False
-    
-    if "plot_arc" in dna:
-        arc_keys = ["setup", "conflict", "climax", "resolution"]
-        for arc_key in arc_keys:
-            if arc_key not in dna["plot_arc"]:
-                logger.error(f"Plot arc missing: {arc_key}")
-                return False
-    
-    if not dna.get("characters") or len(dna["characters"]) == 0:
-        logger.error("Final DNA has no characters")
-        return False
-    
-    if not dna.get("critical_moments") or len(dna["critical_moments"]) == 0:
-        logger.error("Final DNA has no critical moments")
-        return False
-    
-    logger.info("Final DNA validation passed")
-    return True
\ No newline at end of file
+    return check_schema("final_dna", dna, "Final DNA")
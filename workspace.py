@@ -0,0 +1,76 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+RUN_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+def new_run_id():
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def validate_run_id(run_id):
+    # Run ids end up in filesystem paths (and later in URLs), so keep them to a safe alphabet.
+    if not RUN_ID_PATTERN.match(run_id or ""):
+        raise ValueError(f"Invalid run id: {run_id!r}")
+    return run_id
+
+def safe_filename(name):
+    name = os.path.basename(name or "")
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name) or "upload"
+
+def document_key(filename=None, text=""):
+    # Names a story across runs, so an edited upload or paste finds the previous run's chunk manifest.
+    if filename:
+        return f"file:{os.path.basename(filename)}"
+    title = next((line.strip() for line in text.splitlines() if line.strip()), "")
+    return f"text:{title[:200]}" if title else None
+
+def atomic_write(filepath, data, mode="w"):
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return filepath
+
+def last_activity(run_dir):
+    latest = os.path.getmtime(run_dir)
+    for root, _, files in os.walk(run_dir):
+        for name in files:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+            except OSError:
+                continue
+    return latest
+
+def collect_expired_runs(runs_dir, ttl_seconds, keep=()):
+    if not ttl_seconds or not os.path.isdir(runs_dir):
+        return []
+
+    now = time.time()
+    removed = []
+    for run_id in os.listdir(runs_dir):
+        run_dir = os.path.join(runs_dir, run_id)
+        if run_id in keep or not os.path.isdir(run_dir):
+            continue
+        try:
+            if now - last_activity(run_dir) <= ttl_seconds:
+                continue
+            shutil.rmtree(run_dir)
+            removed.append(run_id)
+        except OSError as e:
+            logger.warning(f"Could not remove expired run {run_id}: {e}")
+
+    if removed:
+        logger.info(f"Removed {len(removed)} expired run workspaces")
+    return removed
@@ -1,9 +1,9 @@
-import json
 import logging
-from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from config import Config
-from utils import extract_json_from_response, validate_transformation_map
+from llm_client import get_llm
+from retry import call_with_retry, json_parser
+from utils import Fallback, validate_final_dna, validate_transformation_map
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -11,10 +11,10 @@ logger = logging.getLogger(__name__)
 class WorldBuilder:
     def __init__(self, config):
         self.config = config
-        self.llm = ChatOpenAI(
-            model=config.model_name,
-            temperature=1.0
-        )
+        self.llm = get_llm(config)
+        self.cache = config.get_cache()
+        self.context = config.get_context_builder()
+        self.tracer = config.get_tracer()
     
     def define_new_world(self, story_dna, user_world_choice):
         logger.info(f"Defining new world: {user_world_choice}")
@@ -25,37 +25,38 @@ class WorldBuilder:
             ("user", prompt_config["user"])
         ])
         
-        chain = prompt | self.llm
-        
-        max_retries = 3
-        for attempt in range(max_retries):
-            logger.info(f"Defining world (attempt {attempt + 1}/{max_retries})")
-            
-            try:
-                response = chain.invoke({
-                    "themes": json.dumps(story_dna.get("themes", [])),
-                    "user_world_choice": user_world_choice
-                })
-                
-                parsed = extract_json_from_response(response.content)
-                
-                if parsed:
-                    logger.info("New world defined successfully")
-                    return parsed
-                else:
-                    logger.warning(f"Failed to parse world definition on attempt {attempt + 1}")
-            except Exception as e:
-                logger.error(f"Error defining new world: {e}")
+        inputs = {
+            "themes": self.context.serialize("world_definition", story_dna.get("themes", [])),
+            "user_world_choice": user_world_choice
+        }
+        cache_key = self.config.cache_key("world_definition", prompt_config, inputs)
+        cached = self.cache.get(cache_key, "world_definition")
+        if cached is not None:
+            return cached
+        
+        parsed = call_with_retry(
+            self.config,
+            self.llm,
+            "Defining world",
+            prompt.format_messages(**inputs),
+            json_parser(description="world definition"),
+            schema="world_definition"
+        )
+        
+        if parsed is not None:
+            self.cache.set(cache_key, parsed, "world_definition")
+            logger.info("New world defined successfully")
+            return parsed
         
         logger.error("Failed to define new world, using fallback")
-        return {
+        return Fallback({
             "setting": user_world_choice,
             "era": "contemporary",
             "technology_or_magic": [],
             "culture": "diverse",
             "tone": "balanced",
             "world_rules": []
-        }
+        })
     
     def create_transformation_map(self, story_dna, new_world):
         logger.info("Creating transformation mappings")
@@ -66,46 +67,104 @@ class WorldBuilder:
             ("user", prompt_config["user"])
         ])
         
-        chain = prompt | self.llm
-        
-        max_retries = 3
-        for attempt in range(max_retries):
-            logger.info(f"Creating transformation map (attempt {attempt + 1}/{max_retries})")
-            
-            try:
-                response = chain.invoke({
-                    "story_dna": json.dumps(story_dna, indent=2),
-                    "new_world": json.dumps(new_world, indent=2)
-                })
-                
-                parsed = extract_json_from_response(response.content)
-                
-                if parsed:
-                    full_map = {
-                        "new_world": new_world,
-                        "mappings": parsed
-                    }
-                    
-                    if validate_transformation_map(full_map):
-                        self.config.save_output(full_map, "transformation_map.json", "dna")
-                        logger.info("Transformation map created and saved successfully")
-                        return full_map
-                    else:
-                        logger.warning(f"Invalid transformation map on attempt {attempt + 1}")
-            except Exception as e:
-                logger.error(f"Error creating transformation map: {e}")
+        inputs = {
+            "story_dna": self.context.serialize("transformation_mapping", self.context.mapping_dna(story_dna), story_dna),
+            "new_world": self.context.serialize("transformation_mapping", new_world)
+        }
+        cache_key = self.config.cache_key("transformation_mapping", prompt_config, inputs)
+        cached = self.cache.get(cache_key, "transformation_mapping")
+        if cached is not None:
+            self.config.save_output(cached, "transformation_map.json", "dna")
+            return cached
+        
+        parsed = call_with_retry(
+            self.config,
+            self.llm,
+            "Creating transformation map",
+            prompt.format_messages(**inputs),
+            json_parser(
+                lambda mappings: validate_transformation_map({"new_world": new_world, "mappings": mappings}),
+                "transformation map"
+            ),
+            schema="transformation_mappings"
+        )
+        
+        if parsed is not None:
+            full_map = {
+                "new_world": new_world,
+                "mappings": parsed
+            }
+            self.cache.set(cache_key, full_map, "transformation_mapping")
+            self.config.save_output(full_map, "transformation_map.json", "dna")
+            logger.info("Transformation map created and saved successfully")
+            return full_map
         
         logger.error("Failed to create transformation map, using empty mappings")
-        return {
+        return Fallback({
             "new_world": new_world,
             "mappings": {
                 "character_mappings": {},
                 "conflict_mappings": {},
                 "preserved_dynamics": []
             }
+        })
+    
+    def analyze_short_story(self, story_text, user_world_choice):
+        logger.info("Analyzing short story and building new world in one call")
+        
+        prompt_config = self.config.get_prompt("short_story_analysis")
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", prompt_config["system"]),
+            ("user", prompt_config["user"])
+        ])
+        
+        inputs = {
+            "story_text": story_text,
+            "user_world_choice": user_world_choice
+        }
+        cache_key = self.config.cache_key("short_story_analysis", prompt_config, inputs)
+        cached = self.cache.get(cache_key, "short_story_analysis")
+        if cached is not None:
+            self.config.save_output(cached["transformation_map"], "transformation_map.json", "dna")
+            return cached
+        
+        def is_valid(result):
+            story_dna = result.get("story_dna")
+            new_world = result.get("new_world")
+            if not isinstance(story_dna, dict) or not isinstance(new_world, dict) or not new_world.get("setting"):
+                return False
+            return validate_final_dna(story_dna) and validate_transformation_map({
+                "new_world": new_world,
+                "mappings": result.get("mappings") or {}
+            })
+        
+        parsed = call_with_retry(
+            self.config,
+            self.llm,
+            "Analyzing short story",
+            prompt.format_messages(**inputs),
+            json_parser(is_valid, "story DNA, new world and mappings"),
+            schema="short_story_analysis"
+        )
+        
+        if parsed is None:
+            logger.warning("Single-call analysis failed validation")
+            return None
+        
+        analysis = {
+            "story_dna": parsed["story_dna"],
+            "transformation_map": {
+                "new_world": parsed["new_world"],
+                "mappings": parsed["mappings"]
+            }
         }
+        self.cache.set(cache_key, analysis, "short_story_analysis")
+        self.config.save_output(analysis["transformation_map"], "transformation_map.json", "dna")
+        logger.info("Short story analyzed and transformation map saved")
+        return analysis
     
     def build_new_world(self, story_dna, user_world_choice):
-        new_world = self.define_new_world(story_dna, user_world_choice)
-        transformation_map = self.create_transformation_map(story_dna, new_world)
+        with self.tracer.stage("world_building"):
+            new_world = self.define_new_world(story_dna, user_world_choice)
+            transformation_map = self.create_transformation_map(story_dna, new_world)
         return transformation_map
\ No newline at end of file